@@ -1,20 +1,18 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import os
-import struct
-import wave
-import re
-import json
+from dd2 import sbk
+from dd2.tkjob import BackgroundJob, ProgressPanel
 
 class SBKPacker(tk.Tk):
     def __init__(self):
         super().__init__()
         self.title("SBK Sound Bank Packer (Corrected for Large Files)")
-        self.geometry("750x500")
+        self.geometry("750x550")
         self.resizable(False, False)
         
         self.input_dir_var = tk.StringVar()
         self.output_file_var = tk.StringVar()
+        self.dedup_var = tk.BooleanVar(value=False)
 
         self._create_widgets()
 
@@ -40,8 +38,14 @@ class SBKPacker(tk.Tk):
         browse_output_btn = ttk.Button(output_frame, text="Save As...", command=self.select_output_file)
         browse_output_btn.pack(side="left")
 
+        dedup_check = ttk.Checkbutton(main_frame, text="Store identical sounds only once (deduplicate)", variable=self.dedup_var)
+        dedup_check.pack(anchor="w", pady=(5, 0))
+
         self.pack_button = ttk.Button(main_frame, text="Build SBK File", command=self.pack_files, state="disabled")
-        self.pack_button.pack(pady=20, ipady=10, fill="x")
+        self.pack_button.pack(pady=(20, 5), ipady=10, fill="x")
+
+        self.progress_panel = ProgressPanel(main_frame)
+        self.progress_panel.pack(fill="x", pady=(0, 10))
         
         log_frame = ttk.LabelFrame(main_frame, text="Log", padding="10")
         log_frame.pack(fill="both", expand=True, pady=5)
@@ -81,32 +85,6 @@ class SBKPacker(tk.Tk):
             self._log(f"Selected output file: {filepath}")
             self.check_paths()
 
-    def _read_config(self, config_path, file_basename):
-        """
-        Wczytuje konfigurację dla konkretnego pliku z JSON-a.
-        Zwraca słownik z kluczami 'sample_rate' i 'duration_flag'.
-        Jeśli pliku nie ma lub brakuje wartości, zwraca None.
-        """
-        try:
-            if os.path.exists(config_path):
-                with open(config_path, 'r', encoding='utf-8') as f:
-                    config_data = json.load(f)
-                
-                # Szukaj sekcji dla konkretnego pliku (np. "sound_001.wav")
-                file_entry = config_data.get(file_basename)
-                if file_entry:
-                    # Konwertuj typy, aby były zgodne z kodem pakowania
-                    sr = int(file_entry.get('sample_rate', 0))
-                    df = int(file_entry.get('duration_flag', 0))
-                    # Prosta walidacja: sample_rate musi być dodatni
-                    if sr > 0:
-                        return {'sample_rate': sr, 'duration_flag': df}
-                    else:
-                        self._log(f"  ! Nieprawidłowy sample_rate w config dla {file_basename}. Używam obliczonej wartości.")
-        except Exception as e:
-            self._log(f"  ! Błąd odczytu config.json dla {file_basename}: {e}. Używam obliczonej wartości.")
-        return None
-
     def pack_files(self):
         input_dir = self.input_dir_var.get()
         output_file = self.output_file_var.get()
@@ -114,130 +92,20 @@ class SBKPacker(tk.Tk):
         self.log_text.delete('1.0', tk.END)
         self.log_text.config(state="disabled")
 
-        self._log("Step 1: Searching for files...")
-        try:
-            files_to_pack = []
-            for filename in os.listdir(input_dir):
-                match = re.match(r"sound_(\d+)\.wav$", filename, re.IGNORECASE)
-                if match:
-                    file_number = int(match.group(1))
-                    files_to_pack.append((file_number, os.path.join(input_dir, filename)))
-            
-            if not files_to_pack:
-                messagebox.showerror("Error", f"No files found with the format 'sound_number.wav' in the folder:\n{input_dir}")
-                return
-            
-            files_to_pack.sort()
-            num_files = len(files_to_pack)
-            self._log(f"Found {num_files} files to pack.")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Error while reading the folder: {e}")
-            return
-
-        self._log("Step 2: Preparing data...")
-        
-        HEADER_SIZE = 16
-        INDEX_ENTRY_SLOT_SIZE = 28
-        index_table_size = num_files * INDEX_ENTRY_SLOT_SIZE
-        data_block_start_offset = HEADER_SIZE + index_table_size
-        
-        index_entries_data = []
-        data_block = bytearray()
-        
-        current_absolute_offset = data_block_start_offset
+        dedup = self.dedup_var.get()
 
-        # Sprawdź, czy istnieje config.json w folderze wejściowym
-        config_path = os.path.join(input_dir, "config.json")
-        config_exists = os.path.exists(config_path)
-        if config_exists:
-            self._log("  Plik config.json znaleziony. Próbuję użyć konfiguracji z niego.")
-        else:
-            self._log("  Plik config.json nie znaleziony. Obliczam wartości (sample_rate, duration_flag) z plików .wav.")
-
-        for num, path in files_to_pack:
-            file_basename = os.path.basename(path)
-            config_for_file = None
-            sample_rate = 0
-            duration_flag = 0
-
-            try:
-                # Próba odczytu konfiguracji z pliku JSON
-                if config_exists:
-                    config_for_file = self._read_config(config_path, file_basename)
-
-                with open(path, 'rb') as f_wav:
-                    wav_content = f_wav.read()
-                
-                # Jeśli nie ma konfiguracji w JSON, oblicz wartości z pliku WAV
-                if config_for_file is None:
-                    with wave.open(path, 'rb') as wav_obj:
-                        sample_rate = wav_obj.getframerate()
-                        num_frames = wav_obj.getnframes()
-                        
-                        duration_seconds = 0
-                        if sample_rate > 0:
-                            duration_seconds = num_frames / float(sample_rate)
-                        
-                        duration_flag = 1 if duration_seconds >= 1.0 else 0
-                else:
-                    # Użyj wartości z config.json
-                    sample_rate = config_for_file['sample_rate']
-                    duration_flag = config_for_file['duration_flag']
-                    self._log(f"    [Użyto config.json]")
-
-                file_size = len(wav_content)
-                data_block.extend(wav_content)
-
-                # --- CRITICAL FIX: Use 4-byte unsigned ints ('I') for all fields ---
-                # The format string '<5I' means: Little-endian, 5 Unsigned Integers
-                entry_bytes = struct.pack('<5I',
-                    current_absolute_offset, # Address (4 bytes)
-                    file_size,               # Size (4 bytes)
-                    duration_flag,           # Duration flag (4 bytes)
-                    sample_rate,             # Sample rate (4 bytes)
-                    1                        # Unknown flag (4 bytes, default to 1)
-                )
-                index_entries_data.append(entry_bytes)
-                
-                source_info = f"config" if config_for_file else "WAV"
-                self._log(f" - {os.path.basename(path)} -> Offset: 0x{current_absolute_offset:X}, Size: {file_size} B, Flag: {duration_flag}, Hz: {sample_rate} [{source_info}]")
-                
-                current_absolute_offset += file_size
-                
-            except Exception as e:
-                 messagebox.showerror("Error", f"Could not process file {path}:\n{e}")
-                 return
-
-        self._log("Step 3: Building header...")
-        data_block_size = len(data_block)
-        total_archive_size = HEADER_SIZE + index_table_size + data_block_size
-
-        header = bytearray(16)
-        struct.pack_into('<H', header, 12, num_files)
-        
-        byte_lo = total_archive_size & 0xFF
-        byte_mid = (total_archive_size >> 8) & 0xFF
-        byte_hi = (total_archive_size >> 16) & 0xFF
-        
-        header[8] = byte_lo
-        header[9] = byte_mid
-        header[10] = byte_hi
-        
-        self._log(f"Total archive size: {total_archive_size} bytes.")
-
-        self._log("Step 4: Writing file...")
-        try:
-            with open(output_file, 'wb') as f_out:
-                f_out.write(header)
-                for entry_data in index_entries_data:
-                    f_out.write(entry_data)
-                    f_out.write(b'\x00' * 8) # 8 bytes of padding after each 20-byte entry
-                f_out.write(data_block)
-            self._log("Done! The archive file was created successfully.")
-            messagebox.showinfo("Success", "The archive file was created successfully!")
-        except Exception as e:
-            messagebox.showerror("Write Error", f"Failed to write the output file:\n{e}")
+        def work(job):
+            sbk.pack(input_dir, output_file, log=job.log, progress=job.progress, cancel=job.cancelled, dedup=dedup)
+
+        def on_error(e):
+            if isinstance(e, ValueError):
+                messagebox.showerror("Error", str(e))
+            else:
+                messagebox.showerror("Write Error", f"Failed to write the output file:\n{e}")
+
+        BackgroundJob(self, self.log_text, self.progress_panel, work,
+                      lambda result: messagebox.showinfo("Success", "The archive file was created successfully!"),
+                      on_error, busy_widgets=(self.pack_button,)).start()
 
 if __name__ == "__main__":
     app = SBKPacker()
@@ -1,19 +1,19 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import os
-import struct
-import json
-from pathlib import Path
+from dd2 import sbk
+from dd2.tkjob import BackgroundJob, ProgressPanel
 
 class SBKUnpacker(tk.Tk):
     def __init__(self):
         super().__init__()
         self.title("SBK Sound Bank Unpacker (Index-Based)")
-        self.geometry("750x500")
+        self.geometry("750x570")
         self.resizable(False, False)
         
         self.input_file_var = tk.StringVar()
         self.output_dir_var = tk.StringVar()
+        self.manifest_var = tk.BooleanVar(value=False)
+        self.incremental_var = tk.BooleanVar(value=False)
 
         self._create_widgets()
 
@@ -39,8 +39,17 @@ class SBKUnpacker(tk.Tk):
         browse_output_btn = ttk.Button(output_frame, text="Browse...", command=self.select_output_dir)
         browse_output_btn.pack(side="left")
 
+        manifest_check = ttk.Checkbutton(main_frame, text="Write a checksum manifest (.dd2manifest.json)", variable=self.manifest_var)
+        manifest_check.pack(anchor="w", pady=(5, 0))
+
+        incremental_check = ttk.Checkbutton(main_frame, text="Only write files that differ from the ones already in the folder", variable=self.incremental_var)
+        incremental_check.pack(anchor="w")
+
         self.unpack_button = ttk.Button(main_frame, text="Unpack Files", command=self.unpack_files, state="disabled")
-        self.unpack_button.pack(pady=20, ipady=10, fill="x")
+        self.unpack_button.pack(pady=(20, 5), ipady=10, fill="x")
+
+        self.progress_panel = ProgressPanel(main_frame)
+        self.progress_panel.pack(fill="x", pady=(0, 10))
         
         log_frame = ttk.LabelFrame(main_frame, text="Log", padding="10")
         log_frame.pack(fill="both", expand=True, pady=5)
@@ -85,87 +94,28 @@ class SBKUnpacker(tk.Tk):
         self.log_text.config(state="normal")
         self.log_text.delete('1.0', tk.END)
         self.log_text.config(state="disabled")
-        
-        try:
-            with open(input_file, 'rb') as f:
-                archive_data = f.read()
-            
-            archive_size = len(archive_data)
-            self._log(f"Read {archive_size / 1024:.2f} KB of data. Parsing index...")
-
-            # --- CRITICAL FIX: Read the header and index table ---
-            header_data = archive_data[0:16]
-            if len(header_data) < 16:
-                raise ValueError("File is too small to contain a valid header.")
-            
-            file_count = struct.unpack('<H', header_data[12:14])[0]
-            self._log(f"Found {file_count} entries in the index.")
-
-            os.makedirs(output_dir, exist_ok=True)
-            
-            index_start_offset = 16
-            index_entry_stride = 28 # 20 bytes data + 8 bytes padding
-            index_data_size = 20
-            extracted_count = 0
-
-            # Przygotuj słownik na konfigurację
-            config_data = {}
-
-            for i in range(file_count):
-                entry_offset = index_start_offset + (i * index_entry_stride)
-                entry_data = archive_data[entry_offset : entry_offset + index_data_size]
-
-                # Unpack the entry using the correct 4-byte integer format
-                parts = struct.unpack('<5I', entry_data)
-                absolute_offset = parts[0]
-                block_size = parts[1]
-                duration_flag = parts[2]   # Odczytaj flagę
-                sample_rate = parts[3]     # Odczytaj częstotliwość próbkowania
-                
-                # Sanity checks
-                if block_size == 0:
-                    self._log(f" - Skipping entry #{i+1} (zero size).")
-                    continue
-                if absolute_offset + block_size > archive_size:
-                    self._log(f" - ERROR: Entry #{i+1} points outside the file. Stopping.")
-                    messagebox.showwarning("Warning", f"Entry #{i+1} has invalid data (offset or size is out of bounds). Extraction may be incomplete.")
-                    break
-
-                # Slice the exact file data using offset and size from the index
-                sound_data = archive_data[absolute_offset : absolute_offset + block_size]
-                
-                extracted_count += 1
-                output_filename = f"sound_{extracted_count:03d}.wav"
-                output_path = os.path.join(output_dir, output_filename)
-
-                with open(output_path, 'wb') as f_out:
-                    f_out.write(sound_data)
-
-                # Zapisz metadane do słownika konfiguracyjnego
-                config_data[output_filename] = {
-                    'duration_flag': int(duration_flag),
-                    'sample_rate': int(sample_rate),
-                    'unknown_flag': int(parts[4])  # Ostatnia flaga (domyślnie 1)
-                }
-
-                self._log(f" -> Extracted '{output_filename}' (Size: {block_size} B, Offset: 0x{absolute_offset:X}, Flag: {duration_flag}, Hz: {sample_rate})")
-
-            # Zapisz konfigurację do pliku JSON
-            config_path = os.path.join(output_dir, "config.json")
-            try:
-                with open(config_path, 'w', encoding='utf-8') as config_file:
-                    json.dump(config_data, config_file, indent=4, ensure_ascii=False)
-                self._log(f"\n  Konfiguracja zapisana do: {config_path}")
-            except Exception as e:
-                self._log(f"\n  ! Uwaga: Nie udało się zapisać pliku konfiguracyjnego: {e}")
-
-            self._log(f"\nDone! Extracted a total of {extracted_count} files.")
+
+        write_manifest = self.manifest_var.get()
+        incremental = self.incremental_var.get()
+
+        def work(job):
+            return sbk.unpack(input_file, output_dir, log=job.log,
+                              warn=lambda message: job.post(messagebox.showwarning, "Warning", message),
+                              progress=job.progress, cancel=job.cancelled,
+                              write_manifest=write_manifest, incremental=incremental)
+
+        def on_success(extracted_count):
             messagebox.showinfo("Success", f"Extraction complete! {extracted_count} files were saved.")
 
-        except FileNotFoundError:
-            messagebox.showerror("Error", f"Could not find the input file:\n{input_file}")
-        except Exception as e:
-            messagebox.showerror("Critical Error", f"An unexpected error occurred during unpacking:\n{e}")
+        def on_error(e):
+            if isinstance(e, FileNotFoundError):
+                messagebox.showerror("Error", f"Could not find the input file:\n{input_file}")
+            else:
+                messagebox.showerror("Critical Error", f"An unexpected error occurred during unpacking:\n{e}")
+
+        # The unpack runs on a worker thread; the window stays responsive and can cancel it
+        BackgroundJob(self, self.log_text, self.progress_panel, work, on_success, on_error,
+                      busy_widgets=(self.unpack_button,)).start()
 
 if __name__ == "__main__":
     app = SBKUnpacker()
@@ -1,7 +1,18 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import struct
 import os
+import re
+import mmap
+import queue
+import threading
+from dd2 import sbk, peaks
+from dd2.bankconfig import BankConfig, CONFIG_NAME, sound_name
+
+try:
+    import winsound
+except ImportError:
+    # Only Windows can play a sound straight from memory; elsewhere the preview is waveform-only
+    winsound = None
 
 class EditWindow(tk.Toplevel):
     def __init__(self, parent, entry_obj):
@@ -48,21 +59,17 @@ class EditWindow(tk.Toplevel):
             new_rate = int(self.sample_rate_var.get())
             new_duration = int(self.duration_flag_var.get())
             new_unknown = int(self.unknown_flag_var.get())
+            if not all(0 <= value <= 0xFFFFFFFF for value in (new_rate, new_duration, new_unknown)):
+                raise ValueError
             
             self.result = (new_rate, new_duration, new_unknown)
             self.destroy()
         except ValueError:
-            messagebox.showerror("Invalid Input", "All values must be integers.", parent=self)
-
-class SoundEntry:
-    def __init__(self, index, address_prefix, address_low, block_size, duration_flag, sample_rate, flag2):
-        self.index = index
-        self.absolute_offset = (address_prefix << 16) | address_low
-        self.block_size = block_size
-        self.duration_flag = duration_flag
-        self.sample_rate = sample_rate
-        self.unknown_flag = flag2
-        
+            messagebox.showerror("Invalid Input", "All values must be non-negative 32-bit integers.", parent=self)
+
+class SoundEntry(sbk.SBKEntry):
+    __slots__ = ()
+
     def to_tuple(self):
         return (
             self.index + 1, f"0x{self.absolute_offset:08X}", f"{self.block_size} B",
@@ -70,15 +77,152 @@ class SoundEntry:
             self.duration_flag, self.unknown_flag
         )
 
+class VirtualTreeview(ttk.Frame):
+    """
+    A Treeview that only holds the rows currently on screen. `get_values(position)`
+    returns the column values of the row at `position` of the full list; the
+    visible rows are recycled while scrolling, so the list can be any length.
+    """
+    def __init__(self, parent, columns, get_values):
+        super().__init__(parent)
+        self.get_values = get_values
+        self.row_count = 0
+        self.top = 0
+        self.visible_rows = 1
+        self.selected = None
+        row_height = ttk.Style().lookup("Treeview", "rowheight")
+        self.row_height = int(row_height) if row_height else 20
+
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", selectmode="browse")
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<<TreeviewSelect>>", self._on_select, add="+")
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll(3))
+        for key, step in (("<Up>", -1), ("<Down>", 1), ("<Prior>", "-page"), ("<Next>", "page"), ("<Home>", "home"), ("<End>", "end")):
+            self.tree.bind(key, lambda event, step=step: self._on_key(step))
+
+    def set_row_count(self, row_count):
+        self.row_count = row_count
+        self.selected = None
+        self.top = 0
+        self.refresh()
+
+    def refresh(self):
+        self.top = max(0, min(self.top, self.row_count - self.visible_rows))
+        shown = max(0, min(self.visible_rows, self.row_count - self.top))
+        items = list(self.tree.get_children())
+        while len(items) < shown:
+            items.append(self.tree.insert("", "end"))
+        if len(items) > shown:
+            self.tree.delete(*items[shown:])
+            del items[shown:]
+
+        for offset, item_id in enumerate(items):
+            self.tree.item(item_id, values=self.get_values(self.top + offset))
+
+        if self.selected is not None and self.top <= self.selected < self.top + shown:
+            item_id = items[self.selected - self.top]
+            if self.tree.selection() != (item_id,):
+                self.tree.selection_set(item_id)
+            self.tree.focus(item_id)
+        elif self.tree.selection():
+            self.tree.selection_remove(*self.tree.selection())
+
+        if self.row_count:
+            self.scrollbar.set(self.top / self.row_count, (self.top + shown) / self.row_count)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def scroll(self, rows):
+        self.top += rows
+        self.refresh()
+
+    def see(self, position):
+        if position < self.top:
+            self.top = position
+        elif position >= self.top + self.visible_rows:
+            self.top = position - self.visible_rows + 1
+        self.refresh()
+
+    def select(self, position):
+        if not self.row_count: return
+        self.selected = max(0, min(position, self.row_count - 1))
+        self.see(self.selected)
+        self.event_generate("<<VirtualSelect>>")
+
+    def _on_select(self, event):
+        selection = self.tree.selection()
+        # An empty selection only means the selected row scrolled out of view
+        if not selection: return
+        items = self.tree.get_children()
+        if selection[0] in items:
+            position = self.top + items.index(selection[0])
+            if position != self.selected:
+                self.selected = position
+                self.event_generate("<<VirtualSelect>>")
+
+    def _on_resize(self, event):
+        # The heading takes roughly one row
+        visible_rows = max(1, event.height // self.row_height - 1)
+        if visible_rows != self.visible_rows:
+            self.visible_rows = visible_rows
+            self.refresh()
+
+    def _on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * self.row_count)
+        elif args[0] == "scroll":
+            step = int(args[1])
+            self.top += step * self.visible_rows if args[2] == "pages" else step
+        self.refresh()
+
+    def _on_mousewheel(self, event):
+        notches = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        self.scroll(-3 * notches)
+
+    def _on_key(self, step):
+        current = self.selected if self.selected is not None else self.top
+        if step == "home":
+            self.select(0)
+        elif step == "end":
+            self.select(self.row_count - 1)
+        elif step in ("page", "-page"):
+            self.select(current + (self.visible_rows if step == "page" else -self.visible_rows))
+        else:
+            self.select(current + step)
+        return "break"
+
 class SBKArchiveEditor(tk.Tk):
+    # Column -> SoundEntry field used for sorting and filtering
+    COLUMN_FIELDS = {
+        "#": "index", "Absolute Offset": "absolute_offset", "Size (Bytes)": "block_size",
+        "Size (KB)": "block_size", "Sample Rate": "sample_rate",
+        "Duration Flag": "duration_flag", "Unknown Flag": "unknown_flag"
+    }
+    FILTER_COLUMNS = ("Sample Rate", "Size (Bytes)", "Duration Flag", "Unknown Flag")
+    FILTER_PATTERN = re.compile(r"^\s*(<=|>=|!=|=|<|>)?\s*(\d+)\s*$")
+
     def __init__(self):
         super().__init__()
         self.title("SBK Archive Editor")
-        self.geometry("850x600")
+        self.geometry("980x720")
 
         self.archive_path = None
         self.archive_data = None
         self.sound_entries = []
+        self.columns = {}
+        self.view = []
+        self.sort_column = None
+        self.sort_reverse = False
+        self.parse_queue = None
+        self.peaks = {}
+        self.peak_queue = None
+        self.dirty_entries = set()
         self.is_modified = False
 
         self._create_widgets()
@@ -92,33 +236,62 @@ class SBKArchiveEditor(tk.Tk):
         self.menu_bar.add_cascade(label="File", menu=self.file_menu)
         
         self.file_menu.add_command(label="Open Archive...", command=self.open_file)
+        self.file_menu.add_command(label="Save", command=self.save_archive, state="disabled")
         self.file_menu.add_command(label="Save As...", command=self.save_archive_as, state="disabled")
         self.file_menu.add_separator()
+        self.file_menu.add_command(label="Export config.json...", command=self.export_config, state="disabled")
+        self.file_menu.add_command(label="Apply config.json...", command=self.apply_config, state="disabled")
+        self.file_menu.add_separator()
         self.file_menu.add_command(label="Extract Selected Sound...", command=self.extract_selected_sound, state="disabled")
         self.file_menu.add_separator()
         self.file_menu.add_command(label="Exit", command=self.on_closing)
 
+        filter_frame = ttk.Frame(self, padding=(10, 10, 10, 0))
+        filter_frame.pack(fill="x")
+        ttk.Label(filter_frame, text="Filter:").pack(side="left")
+        self.filter_column_var = tk.StringVar(value=self.FILTER_COLUMNS[0])
+        ttk.Combobox(filter_frame, textvariable=self.filter_column_var, values=self.FILTER_COLUMNS, state="readonly", width=14).pack(side="left", padx=5)
+        self.filter_value_var = tk.StringVar()
+        filter_entry = ttk.Entry(filter_frame, textvariable=self.filter_value_var, width=16)
+        filter_entry.pack(side="left")
+        filter_entry.bind("<Return>", lambda event: self.apply_view())
+        ttk.Button(filter_frame, text="Apply", command=self.apply_view).pack(side="left", padx=5)
+        ttk.Button(filter_frame, text="Clear", command=self.clear_filter).pack(side="left")
+        ttk.Label(filter_frame, text="e.g. 22050, >=1000, !=0", foreground="gray").pack(side="left", padx=10)
+
         frame = ttk.Frame(self, padding="10")
         frame.pack(fill="both", expand=True)
-        columns = ("#", "Absolute Offset", "Size (Bytes)", "Size (KB)", "Sample Rate", "Duration Flag", "Unknown Flag")
-        self.tree = ttk.Treeview(frame, columns=columns, show="headings")
-        for col in columns: self.tree.heading(col, text=col)
+        columns = tuple(self.COLUMN_FIELDS) + ("Waveform",)
+        self.table = VirtualTreeview(frame, columns, self._row_values)
+        self.table.pack(fill="both", expand=True)
+        self.tree = self.table.tree
+        for col in self.COLUMN_FIELDS: self.tree.heading(col, text=col, command=lambda col=col: self.sort_by(col))
+        self.tree.heading("Waveform", text="Waveform")
         self.tree.column("#", width=50, anchor="center")
         self.tree.column("Absolute Offset", width=110, anchor="center")
-        for col in columns[2:]: self.tree.column(col, width=100, anchor="center")
+        for col in columns[2:-1]: self.tree.column(col, width=100, anchor="center")
+        self.tree.column("Waveform", width=130, anchor="w")
         
-        scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
-        self.tree.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
-        
-        self.tree.bind("<<TreeviewSelect>>", self.on_item_select)
+        self.table.bind("<<VirtualSelect>>", self.on_item_select)
         self.tree.bind("<Double-1>", self.edit_selected_item)
 
         self.status_var = tk.StringVar(value="Ready. Please open an archive file.")
         status_bar = ttk.Label(self, textvariable=self.status_var, anchor="w", relief="sunken")
         status_bar.pack(side="bottom", fill="x")
 
+        preview_frame = ttk.LabelFrame(self, text="Preview", padding="5")
+        preview_frame.pack(side="bottom", fill="x", padx=10, pady=(0, 5))
+        self.preview_canvas = tk.Canvas(preview_frame, height=90, background="white", highlightthickness=0)
+        self.preview_canvas.pack(side="left", fill="x", expand=True)
+        self.preview_canvas.bind("<Configure>", lambda event: self.draw_preview())
+        preview_buttons = ttk.Frame(preview_frame)
+        preview_buttons.pack(side="right", fill="y", padx=(10, 0))
+        self.play_button = ttk.Button(preview_buttons, text="Play", command=self.play_selected_sound, state="disabled")
+        self.play_button.pack(fill="x")
+        ttk.Button(preview_buttons, text="Stop", command=self.stop_sound, state="normal" if winsound else "disabled").pack(fill="x", pady=5)
+        self.preview_var = tk.StringVar(value="Select a sound to preview it.")
+        ttk.Label(preview_buttons, textvariable=self.preview_var, width=24, wraplength=170).pack(fill="x")
+
     def update_title(self):
         title = "SBK Archive Editor"
         if self.archive_path:
@@ -134,70 +307,238 @@ class SBKArchiveEditor(tk.Tk):
         
         path = filedialog.askopenfilename(title="Select SBK Archive File", filetypes=[("SBK Sound Bank", "*.sbk"), ("All Files", "*.*")])
         if not path: return
-        self.archive_path = path
         self.update_status(f"Opening and parsing {os.path.basename(path)}...")
-        self.load_and_parse_archive()
+        self.load_and_parse_archive(path)
+
+    def load_and_parse_archive(self, path):
+        # Parsing runs on a worker thread; the window keeps responding while a big bank loads.
+        # archive_path only changes once the new file has been parsed.
+        self.parse_queue = queue.Queue()
+        self.peak_queue = None
+        threading.Thread(target=self._parse_archive, args=(path, self.parse_queue), daemon=True).start()
+        self.after(10, self._check_parse_result, path, self.parse_queue)
+
+    def _parse_archive(self, path, result_queue):
+        # Worker thread: no Tk calls in here
+        try:
+            # Finish rolling back an in-place save that was interrupted last time
+            recovered = sbk.recover_journal(path)
+            archive_data = self._map_bank(path)
+            entries, columns = sbk.load_columns(archive_data, entry_class=SoundEntry)
+            result_queue.put((archive_data, entries, columns, recovered, None))
+        except Exception as e:
+            result_queue.put((None, None, None, False, e))
+
+    @staticmethod
+    def _map_bank(path):
+        # The bank stays mapped while it is open; sounds are only read when played, extracted or decoded
+        with open(path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
 
-    def load_and_parse_archive(self):
+    def _check_parse_result(self, path, result_queue):
+        if result_queue is not self.parse_queue: return  # a newer file was opened meanwhile
         try:
-            with open(self.archive_path, "rb") as f: self.archive_data = f.read()
-            header_data = self.archive_data[0:16]
-            if len(header_data) < 16: raise ValueError("File is too small to contain a 16-byte header.")
-            file_count = struct.unpack('<H', header_data[12:14])[0]
-
-            self.update_status(f"Header parsed. Expecting {file_count} file entries.")
-            self.sound_entries.clear()
-            self.tree.delete(*self.tree.get_children())
-
-            index_start = 16
-            stride = 28
-            data_size = 20
-
-            for i in range(file_count):
-                offset = index_start + (i * stride)
-                entry_data = self.archive_data[offset : offset + data_size]
-                parts = struct.unpack('<10H', entry_data)
-                entry = SoundEntry(i, parts[1], parts[0], parts[2], parts[4], parts[6], parts[8])
-                self.sound_entries.append(entry)
-                self.tree.insert("", "end", values=entry.to_tuple())
-            
-            self.update_status(f"Successfully loaded {len(self.sound_entries)} entries.")
-            self.is_modified = False
-            self.file_menu.entryconfig("Save As...", state="normal")
-            self.update_title()
+            archive_data, entries, columns, recovered, error = result_queue.get_nowait()
+        except queue.Empty:
+            self.after(10, self._check_parse_result, path, result_queue)
+            return
 
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to parse the archive file:\n{e}")
+        if error is not None:
+            messagebox.showerror("Error", f"Failed to parse the archive file:\n{error}")
             self.update_status("Error loading file.")
+            return
+
+        # Only now are the old bank and its discarded edits replaced; a failed open leaves both as they were
+        self.archive_path = path
+        self.archive_data = archive_data
+        self.sound_entries = entries
+        self.columns = columns
+        self.mark_saved()
+        self.peaks = {}
+        self.apply_view()
+        self.load_peaks()
+
+        self.update_status(f"Successfully loaded {len(self.sound_entries)} entries.")
+        if recovered:
+            messagebox.showwarning("Recovered", "The last save of this archive was interrupted. The index was restored to its state before that save.")
+        self.file_menu.entryconfig("Save As...", state="normal")
+        self.file_menu.entryconfig("Export config.json...", state="normal")
+        self.file_menu.entryconfig("Apply config.json...", state="normal")
+        self.update_title()
+
+    def load_peaks(self):
+        # Waveforms come from the bank's peaks sidecar or are decoded on a worker thread; the rows fill in once ready
+        self.peak_queue = queue.Queue()
+        threading.Thread(target=self._compute_peaks, args=(self.archive_path, self.archive_data, self.sound_entries, self.peak_queue), daemon=True).start()
+        self.after(50, self._check_peaks_result, self.peak_queue)
+
+    def _compute_peaks(self, path, archive_data, entries, result_queue):
+        # Worker thread: no Tk calls in here
+        try:
+            cache = peaks.PeakCache(path)
+            result = peaks.bank_peaks(archive_data, entries, cache)
+            cache.save()
+            result_queue.put((result, None))
+        except Exception as e:
+            result_queue.put((None, e))
+
+    def _check_peaks_result(self, result_queue):
+        if result_queue is not self.peak_queue: return  # a newer file was opened meanwhile
+        try:
+            result, error = result_queue.get_nowait()
+        except queue.Empty:
+            self.after(50, self._check_peaks_result, result_queue)
+            return
+        self.peak_queue = None
+        if error is not None:
+            self.update_status(f"Could not compute the waveforms: {error}")
+            return
+        self.peaks = result
+        self.table.refresh()
+        self.draw_preview()
+
+    def _row_values(self, position):
+        entry = self.sound_entries[self.view[position]]
+        return entry.to_tuple() + (peaks.sparkline(self.peaks.get(entry.index)),)
+
+    def _set_field(self, entry, field, value):
+        setattr(entry, field, value)
+        self.columns[field][entry.index] = value
+        self.dirty_entries.add(entry.index)
+
+    def apply_view(self):
+        """Rebuilds the list of shown entries from the filter and sort settings."""
+        view = range(len(self.sound_entries))
+        filter_text = self.filter_value_var.get().strip()
+        if filter_text and self.columns:
+            match = self.FILTER_PATTERN.match(filter_text)
+            if not match:
+                messagebox.showerror("Invalid Filter", "Use a number, optionally preceded by =, !=, <, <=, > or >=.")
+                return
+            operator, value = match.group(1) or "=", int(match.group(2))
+            column = self.columns[self.COLUMN_FIELDS[self.filter_column_var.get()]]
+            test = {
+                "=": value.__eq__, "!=": value.__ne__, "<": value.__gt__,
+                "<=": value.__ge__, ">": value.__lt__, ">=": value.__le__
+            }[operator]
+            view = [i for i in view if test(column[i])]
+        view = list(view)
+        if self.sort_column:
+            view.sort(key=self.columns[self.COLUMN_FIELDS[self.sort_column]].__getitem__, reverse=self.sort_reverse)
+
+        self.view = view
+        self.table.set_row_count(len(view))
+        self.on_item_select(None)
+        if self.sound_entries:
+            self.update_status(f"Showing {len(view)} of {len(self.sound_entries)} entries.")
+
+    def clear_filter(self):
+        self.filter_value_var.set("")
+        self.apply_view()
+
+    def sort_by(self, column):
+        if self.sort_column == column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column, self.sort_reverse = column, False
+        self.apply_view()
+
+    def selected_entry(self):
+        if self.table.selected is None or self.table.selected >= len(self.view): return None
+        return self.sound_entries[self.view[self.table.selected]]
 
     def on_item_select(self, event):
-        state = "normal" if self.tree.selection() else "disabled"
+        entry = self.selected_entry()
+        state = "normal" if entry is not None else "disabled"
         self.file_menu.entryconfig("Extract Selected Sound...", state=state)
+        self.play_button.config(state=state if winsound and entry is not None and entry.block_size else "disabled")
+        self.draw_preview()
+
+    def draw_preview(self):
+        """Draws the peaks of the selected sound, mirrored around the middle line."""
+        canvas = self.preview_canvas
+        canvas.delete("all")
+        width, height = canvas.winfo_width(), canvas.winfo_height()
+        middle = height / 2
+        canvas.create_line(0, middle, width, middle, fill="gray")
+
+        entry = self.selected_entry()
+        wave_peaks = self.peaks.get(entry.index) if entry is not None else None
+        if entry is None:
+            self.preview_var.set("Select a sound to preview it.")
+        elif wave_peaks is not None:
+            self.preview_var.set(f"Sound #{entry.index + 1}, {entry.block_size / 1024:.2f} KB")
+        elif self.peak_queue is not None:
+            self.preview_var.set("Computing waveforms...")
+        else:
+            self.preview_var.set(f"Sound #{entry.index + 1} is not an 8- or 16-bit PCM sound.")
+        if not wave_peaks: return
+
+        bar_width = width / len(wave_peaks)
+        for bucket, level in enumerate(wave_peaks):
+            half = max(1, level * (middle - 2) / 255)
+            x = bucket * bar_width
+            canvas.create_rectangle(x + 1, middle - half, x + bar_width, middle + half, fill="steelblue", outline="")
+
+    def play_selected_sound(self):
+        entry = self.selected_entry()
+        if entry is None or winsound is None: return
+        sound_data = self.archive_data[entry.absolute_offset : entry.absolute_offset + entry.block_size]
+        # PlaySound cannot play from memory asynchronously, so it blocks a thread of its own
+        threading.Thread(target=self._play_sound, args=(sound_data,), daemon=True).start()
+
+    def _play_sound(self, sound_data):
+        try:
+            winsound.PlaySound(sound_data, winsound.SND_MEMORY | winsound.SND_NODEFAULT)
+        except RuntimeError:
+            pass  # not a sound the system can play
+
+    def stop_sound(self):
+        if winsound is not None:
+            winsound.PlaySound(None, 0)
 
     def edit_selected_item(self, event):
-        selected_items = self.tree.selection()
-        if not selected_items: return
-        
-        item_id = selected_items[0]
-        item_index = self.tree.item(item_id)['values'][0] - 1
-        entry_to_edit = self.sound_entries[item_index]
+        entry_to_edit = self.selected_entry()
+        if entry_to_edit is None: return
 
         editor = EditWindow(self, entry_to_edit)
         if editor.result:
             new_rate, new_duration, new_unknown = editor.result
             
-            entry_to_edit.sample_rate = new_rate
-            entry_to_edit.duration_flag = new_duration
-            entry_to_edit.unknown_flag = new_unknown
+            self._set_field(entry_to_edit, "sample_rate", new_rate)
+            self._set_field(entry_to_edit, "duration_flag", new_duration)
+            self._set_field(entry_to_edit, "unknown_flag", new_unknown)
             
-            self.tree.item(item_id, values=entry_to_edit.to_tuple())
+            self.table.refresh()
             
-            self.is_modified = True
-            self.update_title()
+            self.mark_modified()
             self.update_status(f"Entry #{entry_to_edit.index + 1} updated.")
 
+    def mark_modified(self):
+        self.is_modified = True
+        self.file_menu.entryconfig("Save", state="normal")
+        self.update_title()
+
+    def mark_saved(self):
+        self.is_modified = False
+        self.dirty_entries.clear()
+        self.file_menu.entryconfig("Save", state="disabled")
+        self.update_title()
+
+    def save_archive(self):
+        """Patches only the edited index slots of the open archive, through a journal."""
+        if self.archive_data is None: return
+        dirty = [self.sound_entries[i] for i in sorted(self.dirty_entries)]
+        self.update_status(f"Saving {len(dirty)} changed entries to {os.path.basename(self.archive_path)}...")
+        try:
+            sbk.patch_index(self.archive_path, dirty)
+            self.mark_saved()
+            self.update_status(f"Archive saved in place ({len(dirty)} index entries written).")
+        except Exception as e:
+            messagebox.showerror("Save Error", f"An error occurred while saving the file:\n{e}")
+
     def save_archive_as(self):
-        if not self.archive_data: return
+        if self.archive_data is None: return
         
         save_path = filedialog.asksaveasfilename(
             defaultextension=".sbk",
@@ -208,36 +549,68 @@ class SBKArchiveEditor(tk.Tk):
 
         self.update_status(f"Saving archive to {os.path.basename(save_path)}...")
         try:
-            with open(save_path, "wb") as f_out:
-                f_out.write(self.archive_data[0:16])
-                for entry in self.sound_entries:
-                    addr_low = entry.absolute_offset & 0xFFFF
-                    addr_high = (entry.absolute_offset >> 16) & 0xFFFF
-                    
-                    entry_bytes = struct.pack('<HHHHHHHHHH',
-                        addr_low, addr_high, entry.block_size, 0,
-                        entry.duration_flag, 0, entry.sample_rate, 0,
-                        entry.unknown_flag, 0
-                    )
-                    f_out.write(entry_bytes)
-                    f_out.write(b'\x00' * 8)
-
-                data_start = 16 + (len(self.sound_entries) * 28)
-                f_out.write(self.archive_data[data_start:])
-
-            self.is_modified = False
-            self.update_title()
+            if os.path.normcase(os.path.abspath(save_path)) == os.path.normcase(os.path.abspath(self.archive_path)):
+                # The open bank is mapped, so it is patched in place rather than replaced
+                sbk.patch_index(save_path, self.sound_entries)
+            else:
+                sbk.save_as(self.archive_data, self.sound_entries, save_path)
+                # Read from the new file from now on, so the old one is no longer held open by the mapping.
+                # A waveform job still running keeps its own reference to the old mapping.
+                self.archive_data = self._map_bank(save_path)
+
+            # Further in-place saves go to the new file, which holds every edit so far
+            self.archive_path = save_path
+            self.mark_saved()
             self.update_status(f"Archive saved successfully.")
             messagebox.showinfo("Success", "Archive saved successfully!")
 
         except Exception as e:
             messagebox.showerror("Save Error", f"An error occurred while saving the file:\n{e}")
 
+    def export_config(self):
+        if not self.sound_entries: return
+        directory = filedialog.askdirectory(title="Select Folder for config.json")
+        if not directory: return
+        try:
+            config_path = BankConfig.from_entries(self.sound_entries).save(directory)
+            self.update_status(f"Metadata exported to {config_path}.")
+        except Exception as e:
+            messagebox.showerror("Export Error", f"An error occurred while writing {CONFIG_NAME}:\n{e}")
+
+    def apply_config(self):
+        if not self.sound_entries: return
+        path = filedialog.askopenfilename(title="Select config.json", filetypes=[("Bank config", CONFIG_NAME), ("All Files", "*.*")])
+        if not path: return
+        try:
+            config = BankConfig.load(os.path.dirname(path))
+            if config is None: raise FileNotFoundError(path)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to read the config file:\n{e}")
+            return
+
+        # The sounds are numbered the same way the unpacker names them
+        applied_count = 0
+        number = 0
+        for entry in self.sound_entries:
+            if entry.block_size == 0: continue
+            number += 1
+            sound = config.get(sound_name(number))
+            if sound is None: continue
+            self._set_field(entry, "sample_rate", sound.sample_rate)
+            self._set_field(entry, "duration_flag", sound.duration_flag)
+            self._set_field(entry, "unknown_flag", sound.unknown_flag)
+            applied_count += 1
+        self.table.refresh()
+
+        if applied_count:
+            self.mark_modified()
+        self.update_status(f"Applied metadata from {CONFIG_NAME} to {applied_count} entries.")
+
     def on_closing(self):
         if self.is_modified:
             response = messagebox.askyesnocancel("Unsaved Changes", "You have unsaved changes. Do you want to save them before quitting?")
             if response is True:
-                self.save_archive_as()
+                self.save_archive()
                 if not self.is_modified:
                     self.destroy()
             elif response is False:
@@ -246,10 +619,8 @@ class SBKArchiveEditor(tk.Tk):
             self.destroy()
 
     def extract_selected_sound(self):
-        selected_items = self.tree.selection()
-        if not selected_items: return
-        item_index = self.tree.item(selected_items[0])['values'][0] - 1
-        entry_to_extract = self.sound_entries[item_index]
+        entry_to_extract = self.selected_entry()
+        if entry_to_extract is None: return
         save_path = filedialog.asksaveasfilename(
             defaultextension=".wav",
             initialfile=f"sound_{entry_to_extract.index + 1:03d}.wav",
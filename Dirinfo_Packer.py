@@ -1,18 +1,21 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import os
-import struct
-import math
+from dd2 import dirinfo, trace, formats
+from dd2.tkjob import BackgroundJob, ProgressPanel
 
 class DD2Packer(tk.Tk):
     def __init__(self):
         super().__init__()
         self.title("Destruction Derby 2 - DIRINFO Packer")
-        self.geometry("750x500")
+        self.geometry("750x650")
         self.resizable(False, False)
 
         self.input_dir_var = tk.StringVar()
         self.output_file_var = tk.StringVar()
+        self.trace_file_var = tk.StringVar()
+        self.update_var = tk.BooleanVar(value=False)
+        self.dedup_var = tk.BooleanVar(value=False)
+        self.variant_var = tk.StringVar(value=formats.DIRINFO.name)
 
         self._create_widgets()
 
@@ -38,8 +41,34 @@ class DD2Packer(tk.Tk):
         browse_output_btn = ttk.Button(output_frame, text="Save As...", command=self.select_output_file)
         browse_output_btn.pack(side="left")
 
+        trace_frame = ttk.LabelFrame(main_frame, text="3. Optional: access trace to order the files by (one file name per read)", padding="10")
+        trace_frame.pack(fill="x", pady=5)
+
+        self.trace_entry = ttk.Entry(trace_frame, textvariable=self.trace_file_var, state="readonly", width=70)
+        self.trace_entry.pack(side="left", fill="x", expand=True, padx=(0, 5))
+
+        self.trace_browse_btn = ttk.Button(trace_frame, text="Browse...", command=self.select_trace_file)
+        self.trace_browse_btn.pack(side="left")
+        self.trace_clear_btn = ttk.Button(trace_frame, text="Clear", command=lambda: self.trace_file_var.set(""))
+        self.trace_clear_btn.pack(side="left", padx=(5, 0))
+
+        variant_frame = ttk.Frame(main_frame)
+        variant_frame.pack(fill="x", pady=(5, 0))
+        ttk.Label(variant_frame, text="Header layout:").pack(side="left")
+        ttk.Combobox(variant_frame, textvariable=self.variant_var, values=tuple(formats.DIRINFO_VARIANTS), state="readonly", width=10).pack(side="left", padx=5)
+        ttk.Label(variant_frame, text="dd2: table below 0xAA0 (up to 114 files); extended: table runs up to the first file", foreground="gray").pack(side="left", padx=5)
+
+        update_check = ttk.Checkbutton(main_frame, text="Update the existing archive in place (only changed files are written)", variable=self.update_var, command=self.on_update_toggled)
+        update_check.pack(anchor="w", pady=(5, 0))
+
+        dedup_check = ttk.Checkbutton(main_frame, text="Store identical files only once (full build only)", variable=self.dedup_var)
+        dedup_check.pack(anchor="w")
+
         self.pack_button = ttk.Button(main_frame, text="Build File", command=self.pack_files, state="disabled")
-        self.pack_button.pack(pady=20, ipady=10, fill="x")
+        self.pack_button.pack(pady=(20, 5), ipady=10, fill="x")
+
+        self.progress_panel = ProgressPanel(main_frame)
+        self.progress_panel.pack(fill="x", pady=(0, 10))
         
         log_frame = ttk.LabelFrame(main_frame, text="Log", padding="10")
         log_frame.pack(fill="both", expand=True, pady=5)
@@ -79,99 +108,58 @@ class DD2Packer(tk.Tk):
             self._log(f"Selected output file: {filepath}")
             self.check_paths()
 
+    def on_update_toggled(self):
+        # An update keeps the sectors of the existing archive, so there is nothing to order by a trace
+        update = self.update_var.get()
+        self.trace_entry.config(state="disabled" if update else "readonly")
+        for button in (self.trace_browse_btn, self.trace_clear_btn):
+            button.config(state="disabled" if update else "normal")
+
+    def select_trace_file(self):
+        filepath = filedialog.askopenfilename(
+            title="Select Access Trace",
+            filetypes=[("Text Files", "*.txt *.log"), ("All Files", "*.*")]
+        )
+        if filepath:
+            self.trace_file_var.set(filepath)
+            self._log(f"Selected access trace: {filepath}")
+
     def pack_files(self):
         input_dir = self.input_dir_var.get()
         output_file = self.output_file_var.get()
         self.log_text.config(state="normal")
         self.log_text.delete('1.0', tk.END)
         self.log_text.config(state="disabled")
-        
-        SECTOR_SIZE = 2048
-        HEADER_END_OFFSET = 0xAA0
-
-        self._log("Step 1: Finding and sorting files...")
-        all_files = []
-        try:
-            for root, dirs, files in os.walk(input_dir):
-                dirs.sort()
-                files.sort()
-                for file in files:
-                    full_path = os.path.join(root, file)
-                    relative_path = os.path.relpath(full_path, input_dir)
-                    formatted_path = relative_path.replace(os.path.sep, '\\').upper()
-                    all_files.append((formatted_path, full_path))
-            
-            if not all_files:
-                messagebox.showerror("Error", f"No files found in the folder:\n{input_dir}")
-                return
-            
-            self._log(f"Found {len(all_files)} files to pack.")
-        except Exception as e:
-            messagebox.showerror("Error", f"Error while reading the input folder: {e}")
-            return
-
-        self._log("Step 2: Generating header and data write plan...")
-        header_data = bytearray()
-        write_tasks = []
-        
-        current_sector = math.ceil(HEADER_END_OFFSET / SECTOR_SIZE)
-        self._log(f"Header ends at 0x{HEADER_END_OFFSET:X}. First available sector: {current_sector}")
-
-        for i, (formatted_path, full_path) in enumerate(all_files):
-            block_number = i + 1
-            
-            try:
-                data_size = os.path.getsize(full_path)
-            except Exception as e:
-                messagebox.showerror("Error", f"Cannot read the size of file {full_path}: {e}")
-                return
-
-            if block_number in [1, 2]:
-                filename_len, padding_len = 17, 1
-            elif block_number == 12:
-                filename_len, padding_len = 16, 2
+
+        update = self.update_var.get()
+        dedup = self.dedup_var.get()
+        trace_file = self.trace_file_var.get()
+        variant = formats.DIRINFO_VARIANTS[self.variant_var.get()]
+
+        def work(job):
+            if update:
+                if trace_file:
+                    job.log("The access trace is not used: an update keeps the existing layout.")
+                dirinfo.update(input_dir, output_file, log=job.log, progress=job.progress, cancel=job.cancelled, variant=variant)
+            else:
+                access_trace = trace.load_trace(trace_file) if trace_file else None
+                dirinfo.pack(input_dir, output_file, log=job.log, progress=job.progress, cancel=job.cancelled, dedup=dedup,
+                             access_trace=access_trace, variant=variant)
+
+        def on_success(result):
+            if update:
+                messagebox.showinfo("Success", "The archive file was updated successfully!")
             else:
-                filename_len, padding_len = 14, 4
+                messagebox.showinfo("Success", "The archive file was created successfully!")
 
-            filename_bytes = formatted_path.encode('ascii')
-            if len(filename_bytes) > filename_len:
-                filename_bytes = filename_bytes[:filename_len]
+        def on_error(e):
+            if isinstance(e, ValueError):
+                messagebox.showerror("Error", str(e))
             else:
-                filename_bytes = filename_bytes.ljust(filename_len, b'\x00')
-
-            sector_index = current_sector
-            metadata_bytes = struct.pack('<HI', sector_index, data_size)
-
-            header_block = filename_bytes + (b'\x00' * padding_len) + metadata_bytes
-            header_data.extend(header_block)
-
-            write_offset = sector_index * SECTOR_SIZE
-            write_tasks.append((write_offset, full_path))
-            
-            self._log(f" - {formatted_path} -> Size: {data_size} B, Sector: {sector_index} (Offset: 0x{write_offset:X})")
-
-            sectors_needed = math.ceil(data_size / SECTOR_SIZE)
-            current_sector += sectors_needed
-
-        self._log(f"Step 3: Writing the output file...")
-        try:
-            with open(output_file, 'wb') as f_out:
-                f_out.write(header_data)
-                
-                if f_out.tell() < HEADER_END_OFFSET:
-                    padding_to_add = HEADER_END_OFFSET - f_out.tell()
-                    f_out.write(b'\x00' * padding_to_add)
-                
-                for offset, path in write_tasks:
-                    f_out.seek(offset)
-                    with open(path, 'rb') as f_in:
-                        f_out.write(f_in.read())
-            
-            self._log("Done! The archive file was created successfully.")
-            messagebox.showinfo("Success", "The archive file was created successfully!")
-
-        except Exception as e:
-            messagebox.showerror("Write Error", f"Failed to write the output file:\n{e}")
+                messagebox.showerror("Write Error", f"Failed to write the output file:\n{e}")
+
+        BackgroundJob(self, self.log_text, self.progress_panel, work, on_success, on_error,
+                      busy_widgets=(self.pack_button,)).start()
 
 if __name__ == "__main__":
     app = DD2Packer()
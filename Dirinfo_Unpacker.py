@@ -1,18 +1,20 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import os
-import struct
-from pathlib import Path
+from dd2 import dirinfo, formats, batch
+from dd2.tkjob import BackgroundJob, ProgressPanel
 
 class DD2Unpacker(tk.Tk):
     def __init__(self):
         super().__init__()
         self.title("Destruction Derby 2 - DIRINFO Unpacker")
-        self.geometry("750x500")
+        self.geometry("750x600")
         self.resizable(False, False)
 
         self.input_file_var = tk.StringVar()
         self.output_dir_var = tk.StringVar()
+        self.manifest_var = tk.BooleanVar(value=False)
+        self.incremental_var = tk.BooleanVar(value=False)
+        self.variant_var = tk.StringVar(value=formats.DIRINFO.name)
 
         self._create_widgets()
 
@@ -38,8 +40,23 @@ class DD2Unpacker(tk.Tk):
         browse_output_btn = ttk.Button(output_frame, text="Browse...", command=self.select_output_dir)
         browse_output_btn.pack(side="left")
 
+        variant_frame = ttk.Frame(main_frame)
+        variant_frame.pack(fill="x", pady=(5, 0))
+        ttk.Label(variant_frame, text="Header layout:").pack(side="left")
+        ttk.Combobox(variant_frame, textvariable=self.variant_var, values=tuple(formats.DIRINFO_VARIANTS), state="readonly", width=10).pack(side="left", padx=5)
+        ttk.Label(variant_frame, text="dd2: table below 0xAA0 (up to 114 files); extended: table runs up to the first file", foreground="gray").pack(side="left", padx=5)
+
+        manifest_check = ttk.Checkbutton(main_frame, text="Write a checksum manifest (.dd2manifest.json)", variable=self.manifest_var)
+        manifest_check.pack(anchor="w", pady=(5, 0))
+
+        incremental_check = ttk.Checkbutton(main_frame, text="Only write files that differ from the ones already in the folder", variable=self.incremental_var)
+        incremental_check.pack(anchor="w")
+
         self.unpack_button = ttk.Button(main_frame, text="Unpack Files", command=self.unpack_files, state="disabled")
-        self.unpack_button.pack(pady=20, ipady=10, fill="x")
+        self.unpack_button.pack(pady=(20, 5), ipady=10, fill="x")
+
+        self.progress_panel = ProgressPanel(main_frame)
+        self.progress_panel.pack(fill="x", pady=(0, 10))
         
         log_frame = ttk.LabelFrame(main_frame, text="Log", padding="10")
         log_frame.pack(fill="both", expand=True, pady=5)
@@ -68,6 +85,13 @@ class DD2Unpacker(tk.Tk):
         if filepath:
             self.input_file_var.set(filepath)
             self._log(f"Selected input file: {filepath}")
+            try:
+                kind = batch.detect_format(filepath)
+            except OSError:
+                kind = None
+            if kind in batch.DIRINFO_KINDS:
+                self.variant_var.set(batch.DIRINFO_KINDS[kind].name)
+                self._log(f"Detected header layout: {self.variant_var.get()}")
             self.check_paths()
 
     def select_output_dir(self):
@@ -79,68 +103,30 @@ class DD2Unpacker(tk.Tk):
 
     def unpack_files(self):
         input_file = self.input_file_var.get()
-        output_dir = Path(self.output_dir_var.get())
+        output_dir = self.output_dir_var.get()
 
         self.log_text.config(state="normal")
         self.log_text.delete('1.0', tk.END)
         self.log_text.config(state="disabled")
-        
-        try:
-            with open(input_file, 'rb') as f:
-                block_count = 0
-                while f.tell() < 0xAA0:
-                    block = f.read(24)
-                    if len(block) < 24:
-                        break
-
-                    if block_count < 2:
-                        name_length, padding_size = 17, 1
-                    elif block_count == 11: # 12th block (0-indexed)
-                        name_length, padding_size = 16, 2
-                    else:
-                        name_length, padding_size = 14, 4
-
-                    name_bytes = bytearray()
-                    for i in range(name_length):
-                        if block[i] == 0:
-                            break
-                        name_bytes.append(block[i])
-                    name = name_bytes.decode('ascii', errors='replace')
-
-                    index_pos = name_length + padding_size
-                    size_pos = index_pos + 2
-
-                    index = struct.unpack('<H', block[index_pos:index_pos+2])[0]
-                    size = struct.unpack('<I', block[size_pos:size_pos+4])[0]
-                    data_offset = index * 2048
-
-                    if index > 0 and size > 0:
-                        current_pos = f.tell()
-                        f.seek(data_offset)
-                        data = f.read(size)
-                        f.seek(current_pos)
-
-                        output_path = output_dir / name
-                        output_path.parent.mkdir(parents=True, exist_ok=True)
-
-                        with open(output_path, 'wb') as out:
-                            out.write(data)
-
-                        log_msg = f"Unpacked: {name.ljust(30)} (block: {block_count:2d}, sector: {index:5d}, size: {size:8d} B, offset: 0x{data_offset:06X})"
-                        self._log(log_msg)
-                    else:
-                        log_msg = f"Skipped:  {name.ljust(30)} (block: {block_count:2d}, invalid sector or size)"
-                        self._log(log_msg)
-
-                    block_count += 1
-            
-            self._log(f"\nComplete! Files saved to: {output_dir}")
-            messagebox.showinfo("Success", "All files have been successfully unpacked!")
-
-        except FileNotFoundError:
-            messagebox.showerror("Error", f"Could not find the input file:\n{input_file}")
-        except Exception as e:
-            messagebox.showerror("Critical Error", f"An unexpected error occurred during unpacking:\n{e}")
+
+        write_manifest = self.manifest_var.get()
+        incremental = self.incremental_var.get()
+        variant = formats.DIRINFO_VARIANTS[self.variant_var.get()]
+
+        def work(job):
+            dirinfo.unpack(input_file, output_dir, log=job.log, workers=dirinfo.DEFAULT_WORKERS,
+                           progress=job.progress, cancel=job.cancelled,
+                           write_manifest=write_manifest, incremental=incremental, variant=variant)
+
+        def on_error(e):
+            if isinstance(e, FileNotFoundError):
+                messagebox.showerror("Error", f"Could not find the input file:\n{input_file}")
+            else:
+                messagebox.showerror("Critical Error", f"An unexpected error occurred during unpacking:\n{e}")
+
+        BackgroundJob(self, self.log_text, self.progress_panel, work,
+                      lambda result: messagebox.showinfo("Success", "All files have been successfully unpacked!"),
+                      on_error, busy_widgets=(self.unpack_button,)).start()
 
 if __name__ == "__main__":
     app = DD2Unpacker()
@@ -0,0 +1,28 @@
+"""
+Headless core of the Destruction Derby 2 SBK / DIRINFO tools.
+
+Everything needed to parse, pack and unpack the archives lives here; the Tk
+scripts in the repository root are only front-ends over it. Apart from
+dd2.tkjob, which the windows use to run work in the background, nothing in
+this package imports tkinter, so it can be used from batch jobs without a
+display:
+
+    python -m dd2 sbk unpack BANK1.SBK out/
+    python -m dd2 dirinfo pack game_data/ DIRINFO
+
+Single members can be read without unpacking through DirinfoArchive and
+SBKArchive (dd2.archive), which are importable from here.
+"""
+
+_LAZY_EXPORTS = {
+    'DirinfoArchive': 'dd2.archive',
+    'SBKArchive': 'dd2.archive',
+}
+
+
+def __getattr__(name):
+    # Imported on first use, so `import dd2` stays cheap for the CLI
+    if name in _LAZY_EXPORTS:
+        import importlib
+        return getattr(importlib.import_module(_LAZY_EXPORTS[name]), name)
+    raise AttributeError(f"module 'dd2' has no attribute {name!r}")
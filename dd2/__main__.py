@@ -0,0 +1,267 @@
+"""
+Command line front-end:
+
+    python -m dd2 sbk unpack BANK1.SBK out/
+    python -m dd2 sbk pack sounds/ BANK1.SBK
+    python -m dd2 sbk info BANK1.SBK
+    python -m dd2 dirinfo unpack DIRINFO out/
+    python -m dd2 dirinfo pack game_data/ DIRINFO
+    python -m dd2 dirinfo update game_data/ DIRINFO
+    python -m dd2 verify out/ --archive DIRINFO
+    python -m dd2 batch CD_DUMP/ -o extracted/
+    python -m dd2 serve DIRINFO BANK1.SBK --port 8000
+    python -m dd2 bench -o bench.json
+    python -m dd2 gui sbk-edit
+    python -m dd2 dirinfo pack game_data/ DIRINFO --profile --report pack.json
+
+The archive modules are imported only by the subcommand that needs them and
+tkinter only by `gui`, so a batch invocation stays cheap. Every subcommand
+takes --report FILE, which writes the time spent per phase and the files and
+bytes moved to a JSON file (see dd2.instrument), and --profile, which also
+runs cProfile and tracemalloc and prints a summary.
+"""
+import os
+import sys
+import argparse
+
+GUI_TOOLS = {
+    'sbk-unpack': ('Bank1_Unpacker', 'SBKUnpacker'),
+    'sbk-pack': ('Bank1_Packer', 'SBKPacker'),
+    'sbk-edit': ('Bank1_Viewer', 'SBKArchiveEditor'),
+    'dirinfo-unpack': ('Dirinfo_Unpacker', 'DD2Unpacker'),
+    'dirinfo-pack': ('Dirinfo_Packer', 'DD2Packer'),
+}
+
+
+def _logger(args):
+    if args.quiet:
+        return lambda message: None
+    return print
+
+
+def sbk_unpack(args):
+    from dd2 import sbk
+    count = sbk.unpack(args.input, args.output, log=_logger(args),
+                       warn=lambda message: print(f"Warning: {message}", file=sys.stderr),
+                       write_manifest=args.manifest, incremental=args.incremental)
+    if args.quiet:
+        print(f"Extracted {count} files.")
+
+
+def sbk_pack(args):
+    from dd2 import sbk
+    saved_bytes = sbk.pack(args.input, args.output, log=_logger(args), dedup=args.dedup)
+    if args.quiet and args.dedup:
+        print(f"Deduplication saved {saved_bytes} bytes.")
+
+
+def sbk_info(args):
+    from dd2 import sbk
+    size_field, table = sbk.info(args.input, backend=args.backend)
+    print(f"Archive size field: {size_field} bytes, entries: {len(table)}")
+    print(f"{'#':>5}  {'Offset':>10}  {'Size':>10}  {'Rate':>6}  {'Dur':>3}  {'Unk':>3}")
+    for i in range(len(table)):
+        print(f"{i + 1:5d}  0x{int(table.absolute_offset[i]):08X}  {int(table.block_size[i]):10d}  "
+              f"{int(table.sample_rate[i]):6d}  {int(table.duration_flag[i]):3d}  {int(table.unknown_flag[i]):3d}")
+
+
+def _variant(args):
+    from dd2 import formats
+    return formats.DIRINFO_VARIANTS[args.variant]
+
+
+def dirinfo_unpack(args):
+    from dd2 import dirinfo
+    count = dirinfo.unpack(args.input, args.output, log=_logger(args), workers=args.workers,
+                           write_manifest=args.manifest, incremental=args.incremental, variant=_variant(args))
+    if args.quiet:
+        print(f"Extracted {count} files.")
+
+
+def dirinfo_pack(args):
+    from dd2 import dirinfo, trace
+    access_trace = trace.load_trace(args.trace) if args.trace else None
+    dirinfo.pack(args.input, args.output, log=_logger(args), dedup=args.dedup, preallocate=not args.no_preallocate,
+                 access_trace=access_trace, variant=_variant(args))
+
+
+def dirinfo_update(args):
+    from dd2 import dirinfo
+    unchanged, rewritten, relocated = dirinfo.update(args.input, args.output, log=_logger(args), variant=_variant(args))
+    if args.quiet:
+        print(f"{rewritten} rewritten in place, {relocated} relocated, {unchanged} unchanged.")
+
+
+def verify(args):
+    from dd2 import manifest
+    problems = manifest.verify(args.manifest, archive_path=args.archive, workers=args.workers, log=_logger(args))
+    if problems:
+        raise ValueError(f"{len(problems)} members do not match the manifest.")
+    if args.quiet:
+        print("All members match the manifest.")
+
+
+def bench(args):
+    from dd2 import bench
+    report = bench.run(cases=args.cases or bench.CASES, sbk_count=args.sbk_count, dirinfo_count=args.dirinfo_count,
+                       mean_size=args.mean_size, distribution=args.distribution, repeat=args.repeat,
+                       seed=args.seed, workers=args.workers, work_dir=args.work_dir)
+    if args.output:
+        bench.write_report(report, args.output)
+        print(f"Report written to {args.output}")
+
+
+def batch(args):
+    from dd2 import batch
+    results = batch.run(args.sources, args.output, workers=args.workers, threads=args.threads,
+                        log=_logger(args))
+    failed = [result for result in results if result['error']]
+    if args.quiet:
+        print(f"{len(results) - len(failed)} archives unpacked, {len(failed)} failed.")
+    if failed:
+        raise ValueError(f"{len(failed)} of {len(results)} archives could not be unpacked.")
+
+
+def serve(args):
+    from dd2 import server
+    log = _logger(args)
+    log("Press Ctrl+C to stop.")
+    server.serve(args.archives, host=args.host, port=args.port, log=log)
+
+
+def gui(args):
+    import importlib
+    # The Tk front-ends live next to the package, in the repository root
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    module_name, class_name = GUI_TOOLS[args.tool]
+    app = getattr(importlib.import_module(module_name), class_name)()
+    app.mainloop()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m dd2", description="Destruction Derby 2 SBK / DIRINFO tools.")
+    commands = parser.add_subparsers(dest="format", required=True)
+
+    def add_command(group, name, func, help, input_help=None, output_help=None):
+        command = group.add_parser(name, help=help)
+        command.add_argument("input", help=input_help)
+        if output_help:
+            command.add_argument("output", help=output_help)
+        command.add_argument("-q", "--quiet", action="store_true", help="only print a summary")
+        command.set_defaults(func=func)
+        return command
+
+    sbk_commands = commands.add_parser("sbk", help="SBK sound banks").add_subparsers(dest="command", required=True)
+    command = add_command(sbk_commands, "unpack", sbk_unpack, "extract sound_NNN.wav files and config.json",
+                          "SBK file", "destination folder")
+    command.add_argument("--manifest", action="store_true",
+                         help="hash each sound while extracting and write a checksum manifest")
+    command.add_argument("--incremental", action="store_true",
+                         help="only write sounds that differ from the ones already in the destination folder")
+    command = add_command(sbk_commands, "pack", sbk_pack, "build a bank from sound_NNN.wav files",
+                          "folder with WAVE files", "output SBK file")
+    command.add_argument("--dedup", action="store_true",
+                         help="store sounds with identical content once; their entries share an offset")
+    command = add_command(sbk_commands, "info", sbk_info, "print the header and index table", "SBK file")
+    command.add_argument("--backend", choices=("struct", "numpy"), default="struct",
+                         help="how the index table is decoded (default: struct; numpy needs NumPy installed)")
+
+    dirinfo_commands = commands.add_parser("dirinfo", help="DIRINFO archives").add_subparsers(dest="command", required=True)
+    command = add_command(dirinfo_commands, "unpack", dirinfo_unpack, "extract all files", "DIRINFO file", "destination folder")
+    command.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                         help="number of files extracted concurrently (default: number of CPUs)")
+    command.add_argument("--manifest", action="store_true",
+                         help="hash each file while extracting and write a checksum manifest")
+    command.add_argument("--incremental", action="store_true",
+                         help="only write files that differ from the ones already in the destination folder")
+    command = add_command(dirinfo_commands, "pack", dirinfo_pack, "pack a folder tree", "main folder with game data", "output file")
+    command.add_argument("--dedup", action="store_true", help="write identical files once and let them share their sectors")
+    command.add_argument("--no-preallocate", action="store_true",
+                         help="do not reserve the archive's final size before writing it")
+    command.add_argument("--trace", metavar="FILE",
+                         help="access trace (one member name per read); files are laid out in the order they are first read")
+    add_command(dirinfo_commands, "update", dirinfo_update, "rewrite only the changed files of an existing archive",
+                "main folder with game data", "existing DIRINFO file")
+    for name in ("unpack", "pack", "update"):
+        dirinfo_commands.choices[name].add_argument(
+            "--variant", choices=("dd2", "extended"), default="dd2",
+            help="header layout (default: dd2, a table below 0xAA0; extended: the table may run up to the first file)")
+
+    verify_command = commands.add_parser("verify", help="check an extracted folder or an archive against its checksum manifest")
+    verify_command.add_argument("manifest", help="folder written by an unpack with --manifest, or the manifest file itself")
+    verify_command.add_argument("--archive", help="check the byte ranges of this archive instead of the extracted files")
+    verify_command.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                                help="members checked concurrently (default: number of CPUs)")
+    verify_command.add_argument("-q", "--quiet", action="store_true", help="only print a summary")
+    verify_command.set_defaults(func=verify)
+
+    bench_command = commands.add_parser("bench", help="measure pack/unpack throughput on synthetic archives")
+    bench_command.add_argument("--cases", nargs="+", metavar="CASE",
+                               help="cases to run (default: all of sbk.parse, sbk.unpack, sbk.pack, sbk.viewer_load, sbk.viewer_reload, "
+                                    "dirinfo.parse, dirinfo.unpack, dirinfo.pack, dirinfo.update)")
+    bench_command.add_argument("--sbk-count", type=int, default=500, help="sounds in the synthetic bank (default: 500)")
+    bench_command.add_argument("--dirinfo-count", type=int, default=100, help="files in the synthetic DIRINFO (default: 100)")
+    bench_command.add_argument("--mean-size", type=int, default=64 * 1024, help="mean member size in bytes (default: 65536)")
+    bench_command.add_argument("--distribution", choices=("fixed", "uniform", "lognormal"), default="lognormal",
+                               help="member size distribution (default: lognormal)")
+    bench_command.add_argument("--repeat", type=int, default=3, help="runs per case; the fastest is reported (default: 3)")
+    bench_command.add_argument("--seed", type=int, default=0)
+    bench_command.add_argument("-j", "--workers", type=int, help="workers for dirinfo.unpack (default: number of CPUs)")
+    bench_command.add_argument("--work-dir", help="keep the generated corpora in this folder instead of a temporary one")
+    bench_command.add_argument("-o", "--output", help="write the JSON report to this file")
+    bench_command.set_defaults(func=bench)
+
+    batch_command = commands.add_parser("batch", help="unpack every SBK and DIRINFO archive found in folders or globs")
+    batch_command.add_argument("sources", nargs="+", metavar="SOURCE",
+                               help="folders (searched recursively), files or glob patterns; formats are detected from the headers")
+    batch_command.add_argument("-o", "--output", required=True, help="destination folder; the source tree is mirrored below it")
+    batch_command.add_argument("-j", "--workers", type=int, help="archives unpacked at once (default: number of CPUs)")
+    batch_command.add_argument("--threads", type=int, default=1, help="extraction threads inside each DIRINFO unpack (default: 1)")
+    batch_command.add_argument("-q", "--quiet", action="store_true", help="only print a summary")
+    batch_command.set_defaults(func=batch)
+
+    serve_command = commands.add_parser("serve", help="serve archive members over HTTP with Range support")
+    serve_command.add_argument("archives", nargs="+", metavar="ARCHIVE",
+                               help="DIRINFO archives or .sbk banks; each is served under its file name")
+    serve_command.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    serve_command.add_argument("--port", type=int, default=8000, help="port to listen on (default: 8000)")
+    serve_command.add_argument("-q", "--quiet", action="store_true", help="do not log requests")
+    serve_command.set_defaults(func=serve)
+
+    gui_command = commands.add_parser("gui", help="launch one of the Tk tools")
+    gui_command.add_argument("tool", choices=sorted(GUI_TOOLS))
+    gui_command.set_defaults(func=gui)
+
+    for command in [*sbk_commands.choices.values(), *dirinfo_commands.choices.values(),
+                    verify_command, bench_command, batch_command, serve_command, gui_command]:
+        command.add_argument("--profile", action="store_true",
+                             help="also profile the run with cProfile and tracemalloc and print a summary to stderr")
+        command.add_argument("--report", metavar="FILE",
+                             help="write the phase times and counters of the run to this JSON file")
+    return parser
+
+
+def _run(args):
+    if not (args.profile or args.report):
+        args.func(args)
+        return
+    from dd2 import instrument
+    name = " ".join(part for part in (args.format, getattr(args, 'command', None)) if part)
+    context = {key: value for key, value in vars(args).items() if key not in ('func', 'profile', 'report')}
+    log = (lambda text: print(text, file=sys.stderr)) if args.profile else None
+    with instrument.recording(name, profile=args.profile, report_path=args.report, context=context, log=log):
+        args.func(args)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        _run(args)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""
+Random-access readers for DIRINFO archives and SBK banks.
+
+    with DirinfoArchive("DIRINFO") as archive:
+        with archive.open("LEV0\\TRACK.DAT") as member:
+            header = member.read(64)
+
+Opening an archive parses only its header table; the file is memory-mapped
+and a member's bytes are read from the mapping when its stream is read, so
+the cost grows with what is touched rather than with the archive size.
+"""
+import io
+import os
+import mmap
+
+from dd2 import sbk, dirinfo
+from dd2.bankconfig import sound_name
+
+
+class MemberStream(io.RawIOBase):
+    """A read-only, seekable file object over `size` bytes at `offset` of a mapping."""
+
+    def __init__(self, mapping, offset, size, name=None):
+        super().__init__()
+        self._mapping = mapping
+        self._start = offset
+        self._size = size
+        self._position = 0
+        self.name = name
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        self._checkClosed()
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self._checkClosed()
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self._size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if position < 0:
+            raise ValueError(f"Negative seek position {position}")
+        self._position = position
+        return position
+
+    def readinto(self, buffer):
+        self._checkClosed()
+        with memoryview(buffer) as view:
+            count = max(0, min(len(view), self._size - self._position))
+            start = self._start + self._position
+            view[:count] = self._mapping[start:start + count]
+        self._position += count
+        return count
+
+    def readall(self):
+        self._checkClosed()
+        start = self._start + min(self._position, self._size)
+        data = self._mapping[start:self._start + self._size]
+        self._position = max(self._position, self._size)
+        return data
+
+
+class _MappedArchive:
+    def __init__(self, path):
+        self.path = path
+        self._file = self._open(path)
+        try:
+            self.archive_size = os.fstat(self._file.fileno()).st_size
+            # An empty file cannot be mapped; it has no members anyway
+            self._mapping = (mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                             if self.archive_size else b'')
+        except Exception:
+            self._file.close()
+            raise
+        self._members = {}
+
+    @staticmethod
+    def _open(path):
+        return open(path, 'rb')
+
+    def close(self):
+        if isinstance(self._mapping, mmap.mmap):
+            self._mapping.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self._members)
+
+    def __iter__(self):
+        return iter(self._members)
+
+    def __contains__(self, name):
+        return self._key(name) in self._members
+
+    def names(self):
+        return list(self._members)
+
+    def getinfo(self, name):
+        try:
+            return self._members[self._key(name)]
+        except KeyError:
+            raise KeyError(f"There is no member named {name!r} in the archive.") from None
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def span(self, name):
+        """Returns (offset, size) of the member's bytes in the archive file."""
+        offset, size = self._span(self.getinfo(name))
+        if offset + size > self.archive_size:
+            raise ValueError(f"Member {name!r} points outside the file.")
+        return offset, size
+
+    def open(self, name):
+        offset, size = self.span(name)
+        return MemberStream(self._mapping, offset, size, name)
+
+    def read(self, name):
+        with self.open(name) as member:
+            return member.read()
+
+    def _key(self, name):
+        return name
+
+
+class DirinfoArchive(_MappedArchive):
+    """
+    A DIRINFO archive opened for reading. Members are looked up by their
+    header name (backslashes, upper case; forward slashes and lower case are
+    accepted too). As in an unpack, a later block wins over an earlier one
+    with the same name, and blocks without a valid sector or size are left out.
+    `variant` is the format descriptor of the archive (see dd2.formats).
+    """
+
+    def __init__(self, path, variant=dirinfo.FORMAT):
+        super().__init__(path)
+        try:
+            self.entries = dirinfo.read_header(self._file, variant)
+        except Exception:
+            self.close()
+            raise
+        for entry in self.entries:
+            if entry.is_valid:
+                self._members[entry.name] = entry
+
+    def _key(self, name):
+        return name.replace('/', '\\').upper()
+
+    def _span(self, entry):
+        # Like the unpacker, a member that runs past the end of the file is cut short
+        return entry.offset, max(0, min(entry.size, self.archive_size - entry.offset))
+
+
+class SBKArchive(_MappedArchive):
+    """
+    An SBK bank opened for reading. Sounds are looked up by the file name an
+    unpack gives them (sound_001.wav, ... - entries of size 0 get no name)
+    or by their 0-based index in the table.
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        try:
+            self.entries = sbk.read_index(self._mapping)
+        except Exception:
+            self.close()
+            raise
+        number = 0
+        for entry in self.entries:
+            if entry.block_size == 0:
+                continue
+            number += 1
+            self._members[sound_name(number)] = entry
+
+    def getinfo(self, name):
+        if isinstance(name, int):
+            if not 0 <= name < len(self.entries):
+                raise KeyError(f"There is no entry #{name + 1} in the bank.")
+            return self.entries[name]
+        return super().getinfo(name)
+
+    @staticmethod
+    def _open(path):
+        return sbk.open_bank(path)
+
+    def _span(self, entry):
+        return entry.absolute_offset, entry.block_size
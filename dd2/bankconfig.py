@@ -0,0 +1,161 @@
+"""
+The per-sound metadata of an unpacked bank (config.json).
+
+The unpacker writes it, the packer reads it back and the editor can export or
+apply it. It is loaded once into a dict keyed by file name. Banks with many
+sounds also get a compact binary copy (config.bin) that is read instead of the
+JSON as long as config.json keeps the size and mtime recorded in it.
+"""
+import os
+import json
+import struct
+
+CONFIG_NAME = "config.json"
+SIDECAR_NAME = "config.bin"
+SIDECAR_MIN_ENTRIES = 1024
+
+_SIDECAR_MAGIC = b'SBKC'
+_SIDECAR_VERSION = 1
+_SIDECAR_HEADER = struct.Struct('<4sHqQI')   # magic, version, config.json mtime_ns, size, entry count
+_SIDECAR_RECORD = struct.Struct('<H3I')      # name length, duration flag, sample rate, unknown flag
+
+
+def _no_log(message):
+    pass
+
+
+def sound_name(number):
+    return f"sound_{number:03d}.wav"
+
+
+class SoundConfig:
+    __slots__ = ('duration_flag', 'sample_rate', 'unknown_flag')
+
+    def __init__(self, duration_flag, sample_rate, unknown_flag=1):
+        self.duration_flag = duration_flag
+        self.sample_rate = sample_rate
+        self.unknown_flag = unknown_flag
+
+    def to_json(self):
+        return {
+            'duration_flag': self.duration_flag,
+            'sample_rate': self.sample_rate,
+            'unknown_flag': self.unknown_flag
+        }
+
+
+class BankConfig:
+    def __init__(self):
+        self.sounds = {}
+
+    def __len__(self):
+        return len(self.sounds)
+
+    def get(self, name):
+        return self.sounds.get(name)
+
+    def set(self, name, duration_flag, sample_rate, unknown_flag=1):
+        self.sounds[name] = SoundConfig(int(duration_flag), int(sample_rate), int(unknown_flag))
+
+    @classmethod
+    def from_entries(cls, entries):
+        """Builds the config the unpacker would write for these index entries."""
+        config = cls()
+        number = 0
+        for entry in entries:
+            if entry.block_size == 0:
+                continue
+            number += 1
+            config.set(sound_name(number), entry.duration_flag, entry.sample_rate, entry.unknown_flag)
+        return config
+
+    @classmethod
+    def load(cls, folder, log=_no_log):
+        """Returns the config of `folder`, or None when it has no config.json."""
+        config_path = os.path.join(folder, CONFIG_NAME)
+        try:
+            stat = os.stat(config_path)
+        except FileNotFoundError:
+            return None
+
+        config = cls._load_sidecar(os.path.join(folder, SIDECAR_NAME), stat)
+        if config is not None:
+            return config
+
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config_data = json.load(f)
+
+        config = cls()
+        for name, file_entry in config_data.items():
+            try:
+                config.set(name, file_entry.get('duration_flag', 0), file_entry.get('sample_rate', 0),
+                           file_entry.get('unknown_flag', 1))
+            except (AttributeError, TypeError, ValueError) as e:
+                log(f"  ! Błąd odczytu config.json dla {name}: {e}. Używam obliczonej wartości.")
+
+        if len(config) >= SIDECAR_MIN_ENTRIES:
+            config._save_sidecar(folder, stat)
+        return config
+
+    def save(self, folder, only_if_changed=False):
+        """Writes config.json (and the sidecar). With `only_if_changed` an identical config.json is left untouched."""
+        config_path = os.path.join(folder, CONFIG_NAME)
+        text = json.dumps({name: sound.to_json() for name, sound in self.sounds.items()}, indent=4, ensure_ascii=False)
+        if only_if_changed:
+            try:
+                with open(config_path, 'r', encoding='utf-8') as config_file:
+                    if config_file.read() == text:
+                        return config_path
+            except (OSError, UnicodeDecodeError):
+                pass
+        with open(config_path, 'w', encoding='utf-8') as config_file:
+            config_file.write(text)
+
+        sidecar_path = os.path.join(folder, SIDECAR_NAME)
+        if len(self) >= SIDECAR_MIN_ENTRIES:
+            self._save_sidecar(folder, os.stat(config_path))
+        elif os.path.exists(sidecar_path):
+            os.remove(sidecar_path)
+        return config_path
+
+    @classmethod
+    def _load_sidecar(cls, sidecar_path, config_stat):
+        try:
+            with open(sidecar_path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) < _SIDECAR_HEADER.size:
+            return None
+        magic, version, mtime_ns, size, count = _SIDECAR_HEADER.unpack_from(data)
+        if (magic != _SIDECAR_MAGIC or version != _SIDECAR_VERSION
+                or mtime_ns != config_stat.st_mtime_ns or size != config_stat.st_size):
+            return None
+
+        config = cls()
+        position = _SIDECAR_HEADER.size
+        try:
+            for _ in range(count):
+                name_length, duration_flag, sample_rate, unknown_flag = _SIDECAR_RECORD.unpack_from(data, position)
+                position += _SIDECAR_RECORD.size
+                name = data[position:position + name_length].decode('utf-8')
+                position += name_length
+                config.sounds[name] = SoundConfig(duration_flag, sample_rate, unknown_flag)
+        except (struct.error, UnicodeDecodeError):
+            return None
+        return config
+
+    def _save_sidecar(self, folder, config_stat):
+        parts = [_SIDECAR_HEADER.pack(_SIDECAR_MAGIC, _SIDECAR_VERSION, config_stat.st_mtime_ns,
+                                      config_stat.st_size, len(self.sounds))]
+        try:
+            for name, sound in self.sounds.items():
+                encoded_name = name.encode('utf-8')
+                parts.append(_SIDECAR_RECORD.pack(len(encoded_name), sound.duration_flag,
+                                                  sound.sample_rate, sound.unknown_flag))
+                parts.append(encoded_name)
+            with open(os.path.join(folder, SIDECAR_NAME), 'wb') as f:
+                f.write(b''.join(parts))
+        except (OSError, struct.error):
+            # The sidecar is only a cache; config.json stays authoritative
+            pass
@@ -0,0 +1,207 @@
+"""
+Unpacks many archives at once:
+
+    python -m dd2 batch CD_DUMP/ -o extracted/
+    python -m dd2 batch "CD_DUMP/SOUND/*.SBK" CD_DUMP/DIRINFO -o extracted/
+
+Every file found below the given folders or globs is identified by its
+header, so names and extensions do not matter. The archives are spread over
+a process pool, one archive per process, and each is unpacked with
+sbk.unpack / dirinfo.unpack into a folder named like the archive below the
+output folder, mirroring the source tree.
+"""
+import os
+import glob
+import time
+import queue
+import string
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from dd2 import sbk, dirinfo, formats
+
+PROGRESS_INTERVAL = 1.0
+# The DIRINFO variant each detected format is unpacked as (see dd2.formats)
+DIRINFO_KINDS = {'dirinfo': formats.DIRINFO, 'dirinfo-extended': formats.DIRINFO_EXTENDED}
+_NAME_BYTES = frozenset((string.ascii_letters + string.digits + " \\/_-.!#$%&()~").encode('ascii'))
+
+_progress_queue = None
+
+
+def _no_log(message):
+    pass
+
+
+def detect_format(path):
+    """
+    Returns 'sbk', 'dirinfo', 'dirinfo-extended' (a DIRINFO whose table runs
+    up to the first member, see dd2.formats) or None after looking at the
+    header of the file at `path`.
+    """
+    with open(path, 'rb') as f:
+        archive_size = os.fstat(f.fileno()).st_size
+        head = f.read(dirinfo.BLOCK_SIZE)
+
+        # SBK: eight zero bytes, a file count and an index whose first sound is a RIFF file
+        if len(head) >= sbk.HEADER_SIZE and head[:8] == bytes(8):
+            file_count = sbk.read_file_count(head)
+            index_end = sbk.HEADER_SIZE + file_count * sbk.INDEX_SLOT_SIZE
+            if file_count and index_end <= archive_size + 8:
+                f.seek(sbk.HEADER_SIZE)
+                slot = f.read(sbk.INDEX_SLOT_SIZE).ljust(sbk.INDEX_SLOT_SIZE, b'\x00')
+                offset, size = sbk.FORMAT.slot.decode(slot)[:2]
+                if size and offset >= index_end - 8 and offset + size <= archive_size:
+                    f.seek(offset)
+                    if f.read(4) == b'RIFF':
+                        return 'sbk'
+
+        # DIRINFO: the first block holds a printable file name and points past itself
+        if len(head) == dirinfo.BLOCK_SIZE:
+            name = head[:formats.DIRINFO.name_length(0)].split(b'\x00', 1)[0]
+            sector, size = formats.DIRINFO.location.decode(head, formats.DIRINFO.location_offset)
+            if (name and all(byte in _NAME_BYTES for byte in name)
+                    and sector * dirinfo.SECTOR_SIZE >= dirinfo.BLOCK_SIZE
+                    and sector * dirinfo.SECTOR_SIZE + size <= archive_size + dirinfo.SECTOR_SIZE):
+                return _dirinfo_kind(f)
+    return None
+
+
+def _dirinfo_kind(f):
+    # Every block in front of the first member, read as the open-ended variant. The
+    # original layout fits below its header end, and its table is padded up to there.
+    try:
+        entries = dirinfo.read_header(f, formats.DIRINFO_EXTENDED)
+    except ValueError:
+        return None
+    valid = [entry for entry in entries if entry.is_valid]
+    if not valid:
+        return None
+    data_start = min(entry.offset for entry in valid)
+    if data_start >= formats.DIRINFO.header_end and all(entry.block < formats.DIRINFO.max_blocks for entry in valid):
+        return 'dirinfo'
+    return 'dirinfo-extended'
+
+
+def find_archives(sources, log=_no_log):
+    """
+    Expands folders (recursively) and glob patterns in `sources` and returns
+    (format, path) pairs for every file recognised as an archive, sorted by path.
+    """
+    candidates = set()
+    for source in sources:
+        if os.path.isdir(source):
+            for root, dirs, files in os.walk(source):
+                candidates.update(os.path.join(root, file) for file in files)
+        else:
+            matches = glob.glob(source, recursive=True)
+            if not matches and not glob.has_magic(source):
+                raise ValueError(f"No such file or folder: {source}")
+            candidates.update(path for path in matches if os.path.isfile(path))
+
+    archives = []
+    for path in sorted(candidates):
+        try:
+            kind = detect_format(path)
+        except OSError as e:
+            log(f" ! Cannot read {path}: {e}")
+            continue
+        if kind:
+            archives.append((kind, path))
+    return archives
+
+
+def _init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+
+
+def _unpack_one(kind, path, output_dir, threads):
+    """Runs in a pool process. Returns (files, bytes, seconds, error message or None)."""
+    last_report = [0.0]
+    extracted_bytes = [0]
+
+    def progress(done_bytes, total_bytes):
+        extracted_bytes[0] = done_bytes
+        now = time.perf_counter()
+        if now - last_report[0] >= PROGRESS_INTERVAL / 4 or done_bytes == total_bytes:
+            last_report[0] = now
+            _progress_queue.put((path, done_bytes, total_bytes))
+
+    start = time.perf_counter()
+    try:
+        if kind == 'sbk':
+            count = sbk.unpack(path, output_dir, progress=progress)
+        else:
+            count = dirinfo.unpack(path, output_dir, workers=threads, progress=progress, variant=DIRINFO_KINDS[kind])
+    except Exception as e:
+        return 0, 0, time.perf_counter() - start, f"{type(e).__name__}: {e}"
+    return count, extracted_bytes[0], time.perf_counter() - start, None
+
+
+def run(sources, output_dir, workers=None, threads=1, log=print):
+    """
+    Unpacks every archive found in `sources` below `output_dir` on a pool of
+    `workers` processes (default: one per CPU); `threads` is passed on to
+    dirinfo.unpack. Returns a list of per-archive result dicts.
+    """
+    archives = find_archives(sources, log)
+    if not archives:
+        raise ValueError("No SBK or DIRINFO archives found.")
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for kind, path in archives])
+    log(f"Found {len(archives)} archives ({sum(kind == 'sbk' for kind, path in archives)} SBK, "
+        f"{sum(kind in DIRINFO_KINDS for kind, path in archives)} DIRINFO).")
+
+    context = multiprocessing.get_context('spawn')
+    progress_queue = context.Queue()
+    archive_progress = {}
+    results = []
+    start = time.perf_counter()
+
+    def drain_progress():
+        while True:
+            try:
+                path, done_bytes, total_bytes = progress_queue.get_nowait()
+            except queue.Empty:
+                return
+            archive_progress[path] = (done_bytes, total_bytes)
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, mp_context=context,
+                             initializer=_init_worker, initargs=(progress_queue,)) as pool:
+        jobs = {}
+        for kind, path in archives:
+            target = os.path.join(output_dir, os.path.relpath(os.path.abspath(path), root))
+            jobs[pool.submit(_unpack_one, kind, path, target, threads)] = (kind, path, target)
+
+        pending = set(jobs)
+        last_report = time.perf_counter()
+        while pending:
+            finished, pending = wait(pending, timeout=PROGRESS_INTERVAL / 4, return_when=FIRST_COMPLETED)
+            drain_progress()
+            for job in sorted(finished, key=lambda job: jobs[job][1]):
+                kind, path, target = jobs[job]
+                count, total_bytes, seconds, error = job.result()
+                results.append({'path': path, 'format': kind, 'output': target, 'files': count,
+                                'bytes': total_bytes, 'seconds': seconds, 'error': error})
+                if error:
+                    log(f" ! {path}: {error}")
+                else:
+                    rate = total_bytes / seconds / (1024 * 1024) if seconds > 0 else 0.0
+                    log(f" - {path} [{kind}] -> {count} files, {total_bytes / (1024 * 1024):.2f} MB "
+                        f"in {seconds:.2f} s ({rate:.1f} MB/s)")
+
+            now = time.perf_counter()
+            if pending and now - last_report >= PROGRESS_INTERVAL:
+                last_report = now
+                done_bytes = sum(done for done, total in archive_progress.values())
+                known_bytes = sum(total for done, total in archive_progress.values())
+                log(f"   ... {len(results)}/{len(archives)} archives done, "
+                    f"{done_bytes / (1024 * 1024):.1f} MB extracted of {known_bytes / (1024 * 1024):.1f} MB started")
+
+    elapsed = time.perf_counter() - start
+    total_bytes = sum(result['bytes'] for result in results)
+    failed = sum(1 for result in results if result['error'])
+    rate = total_bytes / elapsed / (1024 * 1024) if elapsed > 0 else 0.0
+    log(f"\nDone! {len(results) - failed} archives unpacked, {failed} failed, "
+        f"{sum(result['files'] for result in results)} files, {total_bytes / (1024 * 1024):.2f} MB "
+        f"in {elapsed:.2f} s ({rate:.1f} MB/s).")
+    return results
@@ -0,0 +1,245 @@
+"""
+Throughput benchmarks for the five tools on synthetic archives:
+
+    python -m dd2 bench --sbk-count 2000 --dirinfo-count 100 --mean-size 65536 -o bench.json
+
+The generators follow the layouts in Bank1.md and Dirinfo.md. Every case runs
+in a fresh process, so the peak RSS reported for it is its own.
+"""
+import os
+import sys
+import json
+import math
+import mmap
+import time
+import random
+import shutil
+import struct
+import platform
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from dd2 import sbk, dirinfo, peaks
+
+DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+MAX_DIRINFO_FILES = dirinfo.FORMAT.max_blocks
+
+
+def member_sizes(count, mean_size, distribution, seed=0):
+    rng = random.Random(seed)
+    if distribution == "fixed":
+        return [mean_size] * count
+    if distribution == "uniform":
+        return [rng.randint(1, 2 * mean_size) for _ in range(count)]
+    if distribution == "lognormal":
+        mu = math.log(mean_size) - 0.5
+        return [max(1, int(rng.lognormvariate(mu, 1.0))) for _ in range(count)]
+    raise ValueError(f"Unknown size distribution: {distribution}")
+
+
+def _payload(size, seed):
+    return random.Random(seed).randbytes(size)
+
+
+def make_wav(size, seed, sample_rate=22050):
+    """A mono 16-bit PCM RIFF file of roughly `size` bytes (never less than its 44-byte header)."""
+    frames = max(0, size - 44) // 2
+    data = _payload(frames * 2, seed)
+    fmt = struct.pack('<HHIIHH', 1, 1, sample_rate, sample_rate * 2, 2, 16)
+    body = b'WAVE' + b'fmt ' + struct.pack('<I', len(fmt)) + fmt + b'data' + struct.pack('<I', len(data)) + data
+    return b'RIFF' + struct.pack('<I', len(body)) + body
+
+
+def make_sbk(path, sizes, seed=0):
+    """Writes a bank whose sounds have the given sizes; sounds are streamed, not built in memory."""
+    index = []
+    offset = sbk.HEADER_SIZE + len(sizes) * sbk.INDEX_SLOT_SIZE
+    wav_sizes = []
+    for i, size in enumerate(sizes):
+        wav_size = max(44, 44 + (size - 44) // 2 * 2)
+        sample_rate = 11025 if i % 2 else 22050
+        duration_flag = 1 if (wav_size - 44) // 2 >= sample_rate else 0
+        index.append(sbk.SBKEntry(i, offset, wav_size, duration_flag, sample_rate, 1))
+        wav_sizes.append(wav_size)
+        offset += wav_size
+
+    with open(path, 'wb') as f:
+        f.write(sbk.build_header(offset, len(sizes)))
+        for entry in index:
+            f.write(entry.pack())
+        for entry in index:
+            f.write(make_wav(entry.block_size, seed + entry.index, entry.sample_rate))
+    return offset
+
+
+def dirinfo_names(count):
+    # Sorted like the packer walks the tree, so make_tree() and make_dirinfo() line up
+    return sorted(f"LEV{i % 8}\\F{i:04d}.DAT" for i in range(count))
+
+
+def make_dirinfo(path, sizes, seed=0):
+    """Writes a DIRINFO archive with the members laid out sector by sector as the packer does."""
+    if len(sizes) > MAX_DIRINFO_FILES:
+        raise ValueError(f"A DIRINFO header holds at most {MAX_DIRINFO_FILES} files.")
+    sector = dirinfo.FORMAT.first_sector(len(sizes))
+    with open(path, 'wb') as f:
+        layout = []
+        for i, (name, size) in enumerate(zip(dirinfo_names(len(sizes)), sizes)):
+            f.write(dirinfo.build_block(i, name, sector, size))
+            layout.append((sector, size))
+            sector += math.ceil(size / dirinfo.SECTOR_SIZE)
+        for i, (member_sector, size) in enumerate(layout):
+            f.seek(member_sector * dirinfo.SECTOR_SIZE)
+            f.write(_payload(size, seed + i))
+    return sector * dirinfo.SECTOR_SIZE
+
+
+def make_tree(root, sizes, seed=0):
+    """Writes the folder tree that packs into the archive make_dirinfo() produces."""
+    for i, (name, size) in enumerate(zip(dirinfo_names(len(sizes)), sizes)):
+        path = os.path.join(root, *name.split('\\'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(_payload(size, seed + i))
+
+
+def _dirinfo_parse(path):
+    with open(path, 'rb') as f:
+        return dirinfo.read_header(f)
+
+
+def _viewer_load(path, cached):
+    # What the editor does when a bank is opened: map it, parse the index and
+    # get the peaks of every sound, decoded (cold) or from the sidecar (cached)
+    if not cached:
+        try:
+            os.remove(path + peaks.CACHE_SUFFIX)
+        except FileNotFoundError:
+            pass
+    with open(path, 'rb') as f:
+        archive_data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        entries, columns = sbk.load_columns(archive_data)
+        cache = peaks.PeakCache(path)
+        peaks.bank_peaks(archive_data, entries, cache)
+        cache.save()
+    finally:
+        archive_data.close()
+
+
+def _case_functions(corpus):
+    work = corpus['work']
+    return {
+        'sbk.parse': lambda: sbk.info(corpus['sbk']),
+        'sbk.unpack': lambda: sbk.unpack(corpus['sbk'], os.path.join(work, 'sbk_unpack')),
+        'sbk.pack': lambda: sbk.pack(corpus['sbk_tree'], os.path.join(work, 'packed.sbk')),
+        'sbk.viewer_load': lambda: _viewer_load(corpus['sbk'], cached=False),
+        'sbk.viewer_reload': lambda: _viewer_load(corpus['sbk'], cached=True),
+        'dirinfo.parse': lambda: _dirinfo_parse(corpus['dirinfo']),
+        'dirinfo.unpack': lambda: dirinfo.unpack(corpus['dirinfo'], os.path.join(work, 'dirinfo_unpack'),
+                                                 workers=corpus['workers']),
+        'dirinfo.pack': lambda: dirinfo.pack(corpus['dirinfo_tree'], os.path.join(work, 'DIRINFO.packed')),
+        'dirinfo.update': lambda: dirinfo.update(corpus['dirinfo_tree'], corpus['dirinfo']),
+    }
+
+
+CASES = ('sbk.parse', 'sbk.unpack', 'sbk.pack', 'sbk.viewer_load', 'sbk.viewer_reload',
+         'dirinfo.parse', 'dirinfo.unpack', 'dirinfo.pack', 'dirinfo.update')
+
+
+def _peak_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def _run_case(case, corpus, repeat):
+    run = _case_functions(corpus)[case]
+    baseline_rss = _peak_rss_kb()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return min(timings), timings, baseline_rss, _peak_rss_kb()
+
+
+def build_corpus(work, sbk_count, dirinfo_count, mean_size, distribution, seed=0, workers=None):
+    corpus = {'work': work, 'workers': workers or dirinfo.DEFAULT_WORKERS}
+
+    sbk_sizes = member_sizes(sbk_count, mean_size, distribution, seed)
+    corpus['sbk'] = os.path.join(work, 'BANK.SBK')
+    corpus['sbk_bytes'] = make_sbk(corpus['sbk'], sbk_sizes, seed)
+    corpus['sbk_files'] = sbk_count
+    corpus['sbk_tree'] = os.path.join(work, 'sbk_tree')
+    sbk.unpack(corpus['sbk'], corpus['sbk_tree'])
+    # Leaves the peaks sidecar that sbk.viewer_reload opens the bank with
+    _viewer_load(corpus['sbk'], cached=False)
+
+    dirinfo_sizes = member_sizes(min(dirinfo_count, MAX_DIRINFO_FILES), mean_size, distribution, seed + 1)
+    corpus['dirinfo'] = os.path.join(work, 'DIRINFO')
+    make_dirinfo(corpus['dirinfo'], dirinfo_sizes, seed + 1)
+    corpus['dirinfo_tree'] = os.path.join(work, 'dirinfo_tree')
+    make_tree(corpus['dirinfo_tree'], dirinfo_sizes, seed + 1)
+    corpus['dirinfo_bytes'] = sum(dirinfo_sizes)
+    corpus['dirinfo_files'] = len(dirinfo_sizes)
+    return corpus
+
+
+def run(cases=CASES, sbk_count=500, dirinfo_count=100, mean_size=64 * 1024, distribution="lognormal",
+        repeat=3, seed=0, workers=None, work_dir=None, log=print):
+    """Builds the corpora, runs each case in its own process and returns the report as a dict."""
+    own_work_dir = work_dir is None
+    work = work_dir or tempfile.mkdtemp(prefix="dd2-bench-")
+    os.makedirs(work, exist_ok=True)
+    try:
+        log(f"Generating corpora in {work}...")
+        corpus = build_corpus(work, sbk_count, dirinfo_count, mean_size, distribution, seed, workers)
+
+        results = []
+        context = multiprocessing.get_context('spawn')
+        for case in cases:
+            kind = case.split('.')[0]
+            # Parsing and a cached reload do not read the member data
+            case_bytes = corpus[f'{kind}_bytes'] if not case.endswith(('.parse', '.viewer_reload')) else 0
+            case_files = corpus[f'{kind}_files']
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                best, timings, baseline_rss, peak_rss = pool.submit(_run_case, case, corpus, repeat).result()
+            result = {
+                'case': case,
+                'seconds': best,
+                'timings': timings,
+                'bytes': case_bytes,
+                'files': case_files,
+                'mb_per_s': case_bytes / best / (1024 * 1024) if best > 0 else None,
+                'files_per_s': case_files / best if best > 0 else None,
+                'peak_rss_kb': peak_rss,
+                'baseline_rss_kb': baseline_rss,
+            }
+            results.append(result)
+            throughput = f"{result['mb_per_s']:9.1f} MB/s" if case_bytes and best > 0 else " " * 14
+            log(f"{case:18s} {best * 1000:9.2f} ms {throughput} {result['files_per_s'] or 0:11.0f} files/s  peak RSS {peak_rss} KB")
+
+        return {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'params': {
+                'sbk_count': sbk_count, 'dirinfo_count': corpus['dirinfo_files'], 'mean_size': mean_size,
+                'distribution': distribution, 'repeat': repeat, 'seed': seed, 'workers': corpus['workers'],
+            },
+            'results': results,
+        }
+    finally:
+        if own_work_dir:
+            shutil.rmtree(work, ignore_errors=True)
+
+
+def write_report(report, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
@@ -0,0 +1,482 @@
+import os
+import math
+import mmap
+import time
+import hashlib
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from dd2 import fastio, tables, manifest, layout, trace, formats, instrument
+from dd2.progress import Cancelled, no_progress, never_cancel, check_cancel
+
+FORMAT = formats.DIRINFO
+SECTOR_SIZE = FORMAT.sector_size
+HEADER_END_OFFSET = FORMAT.header_end
+BLOCK_SIZE = FORMAT.block.size
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+
+def _no_log(message):
+    pass
+
+
+def block_layout(block_index, variant=FORMAT):
+    """
+    Returns (filename length, padding length) of the header block at
+    `block_index` (0-based). In the original layout the first two blocks and
+    the 12th one use longer names; every block ends with 2 bytes of sector
+    index and 4 bytes of size. See dd2.formats.
+    """
+    name_length = variant.name_length(block_index)
+    return name_length, variant.location_offset - name_length
+
+
+class DirEntry:
+    """One 24-byte block of the DIRINFO header."""
+
+    __slots__ = ('block', 'name', 'sector', 'size', 'sector_size')
+
+    def __init__(self, block, name, sector, size, sector_size=SECTOR_SIZE):
+        self.block = block
+        self.name = name
+        self.sector = sector
+        self.size = size
+        self.sector_size = sector_size
+
+    @property
+    def offset(self):
+        return self.sector * self.sector_size
+
+    @property
+    def is_valid(self):
+        return self.sector > 0 and self.size > 0
+
+
+def _read_open_table(f, variant):
+    """Reads the blocks of a table without a fixed end: those that lie before the first member."""
+    block_size = variant.block.size
+    location = variant.location.struct
+    data = bytearray()
+    data_start = None
+    scanned = 0
+    while data_start is None or len(data) < data_start:
+        chunk = f.read(variant.sector_size)
+        if not chunk:
+            break
+        data += chunk
+        while (scanned + 1) * block_size <= len(data) and (data_start is None or scanned * block_size < data_start):
+            sector, size = location.unpack_from(data, scanned * block_size + variant.location_offset)
+            if sector > 0 and size > 0:
+                offset = sector * variant.sector_size
+                if data_start is None or offset < data_start:
+                    data_start = offset
+            scanned += 1
+    block_count = (len(data) if data_start is None else min(data_start, len(data))) // block_size
+    return bytes(data[:block_count * block_size])
+
+
+def read_table(f, backend="struct", variant=FORMAT):
+    """
+    Decodes the header blocks of the open archive `f` into columns (see
+    dd2.tables): all blocks that start before the variant's header end, or
+    for a variant without one, all blocks in front of the first member.
+    """
+    f.seek(0)
+    if variant.max_blocks is None:
+        data = _read_open_table(f, variant)
+    else:
+        data = f.read(variant.max_blocks * variant.block.size)
+    return tables.decode_dirinfo_header(data, backend, variant)
+
+
+def read_header(f, variant=FORMAT):
+    """Reads the header blocks of the open archive `f` (see read_table)."""
+    table = read_table(f, variant=variant)
+    return [DirEntry(i, name, sector, size, variant.sector_size)
+            for i, (name, sector, size) in enumerate(zip(table.names, table.sectors, table.sizes))]
+
+
+def unpack(input_file, output_dir, log=_no_log, workers=1, progress=no_progress, cancel=never_cancel,
+           write_manifest=False, incremental=False, variant=FORMAT):
+    """
+    Extracts every member of the DIRINFO archive into `output_dir`; `variant`
+    is its format descriptor (see dd2.formats). The whole
+    header table is parsed first; with `workers` > 1 the members are then
+    copied concurrently with positional reads. With `write_manifest` each
+    member is hashed as it is copied and a checksum manifest is saved (see
+    dd2.manifest). With `incremental` only members that differ from the files
+    already in `output_dir` are written, and the manifest is always saved.
+    Returns the number of files. See dd2.progress for `progress` and `cancel`.
+    """
+    output_dir = Path(output_dir)
+    write_manifest = write_manifest or incremental
+    previous = manifest.PreviousRun(output_dir, 'dirinfo', input_file) if incremental else None
+
+    with open(input_file, 'rb') as f:
+        with instrument.phase("parse"):
+            entries = read_header(f, variant)
+        archive_size = os.fstat(f.fileno()).st_size
+
+        # Later blocks win when two of them carry the same name, as in a serial unpack
+        targets = {}
+        for entry in entries:
+            if entry.is_valid:
+                targets[output_dir / entry.name] = entry
+        superseded = {id(entry) for entry in entries if entry.is_valid and targets[output_dir / entry.name] is not entry}
+
+        # Each output folder is created once instead of once per file
+        for directory in sorted({path.parent for path in targets}):
+            directory.mkdir(parents=True, exist_ok=True)
+
+        view = None
+        if not hasattr(os, 'pread') and archive_size:
+            # No positional reads on this platform - copy out of a shared read-only mapping instead
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            view = memoryview(mapping)
+
+        try:
+            with instrument.phase("extract"), ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                jobs = {}
+                sizes = {}
+                for output_path, entry in targets.items():
+                    sizes[id(entry)] = max(0, min(entry.size, archive_size - entry.offset))
+                    jobs[id(entry)] = pool.submit(manifest.extract_member, f.fileno(), output_path, entry.name,
+                                                  entry.offset, sizes[id(entry)], view, previous, write_manifest,
+                                                  entry.sector)
+
+                total_bytes = sum(sizes.values())
+                done_bytes = 0
+                records = {}
+                unchanged_count = 0
+                for entry in entries:
+                    if cancel():
+                        # Members already being copied finish; the queued ones never start
+                        for job in jobs.values():
+                            job.cancel()
+                        check_cancel(cancel)
+                    if entry.is_valid:
+                        if id(entry) in superseded:
+                            # A later block with the same name owns the file on disk
+                            log(f"Superseded: {entry.name.ljust(28)} (block: {entry.block:2d}, a later block has the same name)")
+                            continue
+                        record, written = jobs[id(entry)].result()
+                        if record is not None:
+                            records[entry.name] = record
+                        done_bytes += sizes[id(entry)]
+                        progress(done_bytes, total_bytes)
+                        instrument.count("bytes_read", sizes[id(entry)])
+                        if not written:
+                            unchanged_count += 1
+                            instrument.count("files_unchanged")
+                            log(f"Unchanged: {entry.name}")
+                            continue
+                        instrument.count("files_written")
+                        instrument.count("bytes_written", sizes[id(entry)])
+                        log(f"Unpacked: {entry.name.ljust(30)} (block: {entry.block:2d}, sector: {entry.sector:5d}, size: {entry.size:8d} B, offset: 0x{entry.offset:06X})")
+                    else:
+                        log(f"Skipped:  {entry.name.ljust(30)} (block: {entry.block:2d}, invalid sector or size)")
+        finally:
+            if view is not None:
+                view.release()
+                mapping.close()
+
+    if write_manifest:
+        with instrument.phase("manifest"):
+            manifest_path = manifest.save(output_dir, manifest.build('dirinfo', input_file, list(records.values())))
+        log(f"Checksum manifest saved to: {manifest_path}")
+    if incremental:
+        log(f"{len(targets) - unchanged_count} files written, {unchanged_count} already up to date.")
+
+    log(f"\nComplete! Files saved to: {output_dir}")
+    return len(targets)
+
+
+def scan_tree(input_dir):
+    """
+    Returns (archive name, full path) pairs for every file below `input_dir`
+    in sorted walk order; archive names use upper case and backslashes.
+    """
+    all_files = []
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        files.sort()
+        for file in files:
+            full_path = os.path.join(root, file)
+            relative_path = os.path.relpath(full_path, input_dir)
+            if relative_path == manifest.MANIFEST_NAME:
+                # Written by the unpacker, not part of the game data
+                continue
+            formatted_path = relative_path.replace(os.path.sep, '\\').upper()
+            all_files.append((formatted_path, full_path))
+    return all_files
+
+
+def build_block(block_index, formatted_path, sector_index, data_size, variant=FORMAT):
+    return variant.encode_block(block_index, formatted_path, sector_index, data_size)
+
+
+def _fingerprint(path):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb', buffering=0) as f:
+        for chunk in iter(lambda: f.read(fastio.CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def find_duplicates(all_files, sizes, workers=DEFAULT_WORKERS):
+    """
+    Maps the index of every file whose content repeats an earlier file to the
+    index of that first file. Only files that share their size with another
+    one are hashed, on a thread pool.
+    """
+    size_counts = {}
+    for size in sizes:
+        size_counts[size] = size_counts.get(size, 0) + 1
+    candidates = [i for i, size in enumerate(sizes) if size > 0 and size_counts[size] > 1]
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        digests = pool.map(_fingerprint, [all_files[i][1] for i in candidates])
+        first_seen = {}
+        duplicates = {}
+        for i, digest in zip(candidates, digests):
+            original = first_seen.setdefault((sizes[i], digest), i)
+            if original != i:
+                duplicates[i] = original
+    return duplicates
+
+
+def assign_sectors(sizes, order=None, duplicates=None, variant=FORMAT):
+    """
+    Gives the files consecutive sectors after the header, taking them in
+    `order` (default: their own order). A file listed in `duplicates` shares
+    the sector of its original. Returns (sector of every file, indices of
+    the files whose data has to be written, in sector order).
+    """
+    duplicates = duplicates or {}
+    sectors = [None] * len(sizes)
+    written = []
+    current_sector = variant.first_sector(len(sizes))
+    for i in (range(len(sizes)) if order is None else order):
+        original = duplicates.get(i, i)
+        if sectors[original] is None:
+            sectors[original] = current_sector
+            written.append(original)
+            current_sector += math.ceil(sizes[original] / variant.sector_size)
+        sectors[i] = sectors[original]
+    return sectors, written
+
+
+def _trace_order(all_files, sizes, duplicates, access_trace, log, variant):
+    """Returns the order to lay the files out in for `access_trace`, or None to keep the walk order."""
+    trace_indices, unknown = trace.resolve(access_trace, [formatted_path for formatted_path, full_path in all_files],
+                                           variant.name_length)
+    log(f"Access trace: {len(trace_indices)} reads of {len(set(trace_indices))} files"
+        + (f", {len(unknown)} names not in the folder (e.g. {unknown[0]})" if unknown else "") + ".")
+    if not trace_indices:
+        return None
+
+    first_sector = variant.first_sector(len(all_files))
+    order = trace.first_read_order(len(all_files), trace_indices)
+    before = trace.seek_cost(trace_indices, assign_sectors(sizes, None, duplicates, variant)[0], sizes,
+                             variant.sector_size, first_sector)
+    after = trace.seek_cost(trace_indices, assign_sectors(sizes, order, duplicates, variant)[0], sizes,
+                            variant.sector_size, first_sector)
+    log(f"Estimated seek cost of the trace: {before[0]} sectors in {before[1]} seeks in walk order, "
+        f"{after[0]} sectors in {after[1]} seeks in trace order.")
+    if after >= before:
+        log("The trace order does not reduce seeking; keeping the walk order.")
+        return None
+    return order
+
+
+def plan(all_files, log=_no_log, dedup=False, access_trace=None, variant=FORMAT):
+    """
+    Assigns consecutive sectors to `all_files`. With `dedup`, a file with the
+    same content as an earlier one gets that file's sector instead of its
+    own. With `access_trace` (member names in read order, see dd2.trace) the
+    sectors are handed out in the order the files are first read, when that
+    cuts the estimated seeking; the header blocks keep the walk order either
+    way. Returns the header bytes and a list of (write offset, full path,
+    size) tasks, one per payload that has to be written.
+    """
+    first_sector = variant.first_sector(len(all_files))
+    log(f"Header ends at 0x{variant.table_end(len(all_files)):X}. First available sector: {first_sector}")
+
+    sizes = []
+    for formatted_path, full_path in all_files:
+        try:
+            sizes.append(os.path.getsize(full_path))
+        except Exception as e:
+            raise ValueError(f"Cannot read the size of file {full_path}: {e}") from e
+
+    duplicates = find_duplicates(all_files, sizes) if dedup else {}
+    order = _trace_order(all_files, sizes, duplicates, access_trace, log, variant) if access_trace is not None else None
+    sectors, written = assign_sectors(sizes, order, duplicates, variant)
+
+    header_data = bytearray()
+    for i, (formatted_path, full_path) in enumerate(all_files):
+        header_data.extend(variant.encode_block(i, formatted_path, sectors[i], sizes[i]))
+        if i in duplicates:
+            log(f" - {formatted_path} -> Size: {sizes[i]} B, same data as {all_files[duplicates[i]][0]} (Sector: {sectors[i]})")
+        else:
+            log(f" - {formatted_path} -> Size: {sizes[i]} B, Sector: {sectors[i]} (Offset: 0x{sectors[i] * variant.sector_size:X})")
+    write_tasks = [(sectors[i] * variant.sector_size, all_files[i][1], sizes[i]) for i in written]
+
+    if dedup:
+        saved_sectors = sum(math.ceil(sizes[i] / variant.sector_size) for i in duplicates)
+        log(f"Deduplication: {len(duplicates)} files share the sectors of an identical file, "
+            f"{saved_sectors * variant.sector_size} bytes saved.")
+    return header_data, write_tasks
+
+
+def pack(input_dir, output_file, log=_no_log, progress=no_progress, cancel=never_cancel, dedup=False, preallocate=True,
+         access_trace=None, variant=FORMAT):
+    """
+    Packs the folder tree below `input_dir` into a DIRINFO archive. With
+    `dedup`, identical files are written once and share their sectors;
+    without `preallocate`, the file is not reserved up front (see
+    dd2.layout); with `access_trace`, the sectors follow the order the
+    game reads the files in (see plan). `variant` is the format descriptor
+    to write (see dd2.formats). A cancelled pack removes the incomplete
+    output file.
+    """
+    log("Step 1: Finding and sorting files...")
+    try:
+        with instrument.phase("walk"):
+            all_files = scan_tree(input_dir)
+    except Exception as e:
+        raise ValueError(f"Error while reading the input folder: {e}") from e
+    if not all_files:
+        raise ValueError(f"No files found in the folder:\n{input_dir}")
+    log(f"Found {len(all_files)} files to pack.")
+
+    log("Step 2: Generating header and data write plan...")
+    with instrument.phase("plan"):
+        header_data, write_tasks = plan(all_files, log, dedup, access_trace, variant)
+
+    log(f"Step 3: Writing the output file...")
+    # The sector plan fixes the final size and every offset, so the archive is
+    # written front to back, padding included, in large sequential writes.
+    archive_size = max([variant.table_end(len(all_files))] + [offset + size for offset, path, size in write_tasks])
+    start_time = time.perf_counter()
+
+    try:
+        with instrument.phase("write"), open(output_file, 'wb', buffering=0) as f_out:
+            stats = layout.write_layout(f_out.fileno(), header_data, write_tasks, archive_size,
+                                        progress=progress, cancel=cancel, preallocate=preallocate)
+    except Cancelled:
+        os.remove(output_file)
+        raise
+
+    elapsed = time.perf_counter() - start_time
+    instrument.count("files_written", len(write_tasks))
+    instrument.count("bytes_read", stats.payload_bytes)
+    instrument.count("bytes_written", stats.archive_size - stats.hole_bytes)
+    instrument.count("write_calls", stats.write_calls)
+    rate = stats.payload_bytes / elapsed / (1024 * 1024) if elapsed > 0 else 0.0
+    log(stats.describe())
+    log(f"Wrote {stats.payload_bytes / (1024 * 1024):.2f} MB of file data in {elapsed:.2f} s "
+        f"({rate:.2f} MB/s, {stats.write_calls} writes).")
+    log("Done! The archive file was created successfully.")
+    return len(all_files)
+
+
+def _sector_capacity(entries, archive_size, sector_size=SECTOR_SIZE):
+    """Maps each used sector to the number of sectors available before the next member starts."""
+    starts = sorted({entry.sector for entry in entries if entry.is_valid})
+    end_sector = math.ceil(archive_size / sector_size)
+    capacity = {}
+    for sector, next_sector in zip(starts, starts[1:] + [end_sector]):
+        capacity[sector] = next_sector - sector
+    return capacity
+
+
+def update(input_dir, archive_path, log=_no_log, progress=no_progress, cancel=never_cancel, variant=FORMAT):
+    """
+    Brings an existing archive up to date with `input_dir` in place. Only
+    members whose content changed are written: back into their own sectors
+    when they still fit, otherwise to the end of the archive. Just the
+    affected header blocks are patched. The folder must still contain the
+    same files as the archive; anything else needs a full pack. Cancelling
+    stops between members, so the archive stays consistent.
+    Returns (unchanged, rewritten, relocated) counts.
+    """
+    log("Step 1: Comparing the folder with the archive header...")
+    with instrument.phase("walk"):
+        all_files = scan_tree(input_dir)
+
+    with open(archive_path, 'r+b', buffering=0) as f:
+        fd = f.fileno()
+        with instrument.phase("parse"):
+            entries = read_header(f, variant)
+        archive_size = os.fstat(fd).st_size
+
+        # The packer gives the n-th file of the walk the n-th block, so both lists must line up
+        members = entries[:len(all_files)]
+        if (len(members) != len(all_files)
+                or any(entry.name != formatted_path[:variant.name_length(entry.block)]
+                       for entry, (formatted_path, full_path) in zip(members, all_files))
+                or any(entry.is_valid for entry in entries[len(all_files):])):
+            raise ValueError("The folder no longer contains the same files as the archive. Use a full pack instead.")
+
+        capacity = _sector_capacity(entries, archive_size, variant.sector_size)
+        sector_users = {}
+        for entry in entries:
+            if entry.is_valid:
+                sector_users[entry.sector] = sector_users.get(entry.sector, 0) + 1
+
+        tail_sector = math.ceil(archive_size / variant.sector_size)
+        unchanged_count = rewritten_count = relocated_count = 0
+
+        total_bytes = sum(os.path.getsize(full_path) for formatted_path, full_path in all_files)
+        done_bytes = 0
+
+        log("Step 2: Writing changed files...")
+        for entry, (formatted_path, full_path) in zip(members, all_files):
+            check_cancel(cancel)
+            with instrument.phase("compare"):
+                matches = fastio.file_matches(full_path, fd, entry.offset, entry.size)
+            instrument.count("bytes_read", entry.size)
+            if matches:
+                unchanged_count += 1
+                instrument.count("files_unchanged")
+                done_bytes += entry.size
+                progress(done_bytes, total_bytes)
+                continue
+
+            new_size = os.path.getsize(full_path)
+            sectors_needed = math.ceil(new_size / variant.sector_size)
+
+            # Empty members own no sectors, and a sector shared with another block can never be rewritten in place
+            if entry.is_valid and sector_users[entry.sector] == 1 and sectors_needed <= capacity[entry.sector]:
+                fastio.copy_file_into(full_path, fd, entry.offset, new_size)
+                if new_size < entry.size:
+                    fastio.write_at(fd, bytes(entry.size - new_size), entry.offset + new_size)
+                rewritten_count += 1
+                log(f" - {formatted_path} -> rewritten in place (sector: {entry.sector}, size: {entry.size} -> {new_size} B)")
+            else:
+                if tail_sector > 0xFFFF:
+                    raise ValueError(f"No sector index left to relocate {formatted_path}. Use a full pack instead.")
+                if entry.is_valid:
+                    sector_users[entry.sector] -= 1
+                    if variant.max_blocks is None and sector_users[entry.sector] == 0:
+                        # The table of such a variant runs up to the first used sector, so vacated
+                        # sectors must read as empty blocks rather than as leftover data
+                        fastio.write_at(fd, bytes(entry.size), entry.offset)
+                entry.sector = tail_sector
+                fastio.copy_file_into(full_path, fd, entry.offset, new_size)
+                tail_sector += max(1, sectors_needed)
+                relocated_count += 1
+                log(f" - {formatted_path} -> relocated to the end (sector: {entry.sector}, size: {entry.size} -> {new_size} B)")
+
+            instrument.count("files_written")
+            instrument.count("bytes_written", new_size)
+            entry.size = new_size
+            # Only the sector index and size at the end of the block change
+            fastio.write_at(fd, variant.location.encode(entry.sector, entry.size),
+                            entry.block * variant.block.size + variant.location_offset)
+            done_bytes += new_size
+            progress(done_bytes, total_bytes)
+
+    log(f"Done! {rewritten_count} rewritten in place, {relocated_count} relocated, {unchanged_count} unchanged.")
+    return unchanged_count, rewritten_count, relocated_count
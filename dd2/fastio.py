@@ -0,0 +1,145 @@
+import os
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def copy_range(src_fd, dst_fd, offset, size, view=None):
+    """
+    Copies `size` bytes starting at `offset` of the source descriptor into the
+    destination descriptor. The kernel does the copy when it can
+    (copy_file_range, then sendfile); otherwise the bytes are written straight
+    out of the memory-mapped `view`, or read in chunks with os.pread when no
+    view is given. Every method is positional, so several threads can copy
+    from the same source descriptor at once.
+    """
+    end = offset + size
+    for kernel_copy in (getattr(os, 'copy_file_range', None), getattr(os, 'sendfile', None)):
+        if kernel_copy is None:
+            continue
+        try:
+            while offset < end:
+                if kernel_copy is os.sendfile:
+                    copied = os.sendfile(dst_fd, src_fd, offset, end - offset)
+                else:
+                    copied = os.copy_file_range(src_fd, dst_fd, end - offset, offset)
+                if copied == 0:
+                    break
+                offset += copied
+            if offset == end:
+                return
+        except OSError:
+            # Not supported for this pair of files (e.g. another filesystem) - try the next method
+            pass
+    if view is not None:
+        while offset < end:
+            offset += os.write(dst_fd, view[offset:end])
+        return
+    if not hasattr(os, 'pread'):
+        # Only safe for a descriptor that is not shared between threads
+        os.lseek(src_fd, offset, os.SEEK_SET)
+    while offset < end:
+        if hasattr(os, 'pread'):
+            chunk = os.pread(src_fd, min(CHUNK_SIZE, end - offset), offset)
+        else:
+            chunk = os.read(src_fd, min(CHUNK_SIZE, end - offset))
+        if not chunk:
+            raise ValueError(f"Unexpected end of file at offset 0x{offset:X}.")
+        write_all(dst_fd, chunk)
+        offset += len(chunk)
+
+
+def read_at(fd, size, offset):
+    if hasattr(os, 'pread'):
+        return os.pread(fd, size, offset)
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, size)
+
+
+def write_at(fd, data, offset):
+    if hasattr(os, 'pwrite'):
+        with memoryview(data) as view:
+            written = 0
+            while written < len(view):
+                written += os.pwrite(fd, view[written:], offset + written)
+        return
+    os.lseek(fd, offset, os.SEEK_SET)
+    write_all(fd, data)
+
+
+def file_matches(path, fd, offset, size):
+    """True when the file at `path` holds exactly the `size` bytes found at `offset` of `fd`."""
+    with open(path, 'rb', buffering=0) as f_in:
+        if os.fstat(f_in.fileno()).st_size != size:
+            return False
+        position = 0
+        while position < size:
+            expected = f_in.read(min(CHUNK_SIZE, size - position))
+            if not expected or read_at(fd, len(expected), offset + position) != expected:
+                return False
+            position += len(expected)
+    return True
+
+
+def copy_file_into(src_path, dst_fd, dst_offset, size):
+    """
+    Streams the first `size` bytes of `src_path` into `dst_fd` at `dst_offset`,
+    never holding more than CHUNK_SIZE bytes of it in memory.
+    """
+    with open(src_path, 'rb', buffering=0) as f_in:
+        os.lseek(dst_fd, dst_offset, os.SEEK_SET)
+        copy_range(f_in.fileno(), dst_fd, 0, size)
+
+
+def copy_range_hashed(src_fd, dst_fd, offset, size, hashers, view=None):
+    """
+    Like copy_range(), but every chunk is also fed to each of `hashers`
+    (hashlib-style objects) between reading and writing it, so hashing costs
+    no second read. Chunks come from the memory-mapped `view` when given,
+    otherwise from positional reads.
+    """
+    end = offset + size
+    while offset < end:
+        count = min(CHUNK_SIZE, end - offset)
+        chunk = view[offset:offset + count] if view is not None else read_at(src_fd, count, offset)
+        if not chunk:
+            raise ValueError(f"Unexpected end of file at offset 0x{offset:X}.")
+        for hasher in hashers:
+            hasher.update(chunk)
+        write_all(dst_fd, chunk)
+        offset += len(chunk)
+
+
+def copy_file_hashed(src_path, dst_fd, dst_offset, size, digest):
+    """
+    Like copy_file_into(), but the bytes pass through Python so they can be
+    fed to `digest` (a hashlib object) on the way. Returns the bytes copied.
+    """
+    copied = 0
+    with open(src_path, 'rb', buffering=0) as f_in:
+        while copied < size:
+            chunk = f_in.read(min(CHUNK_SIZE, size - copied))
+            if not chunk:
+                raise ValueError(f"Unexpected end of file at offset 0x{copied:X}.")
+            digest.update(chunk)
+            write_at(dst_fd, chunk, dst_offset + copied)
+            copied += len(chunk)
+    return copied
+
+
+def preallocate(fd, size):
+    """Reserves `size` bytes for the file behind `fd`; unwritten ranges read back as zeros."""
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return
+        except OSError:
+            # The filesystem cannot reserve blocks - still fix the final size below
+            pass
+    os.ftruncate(fd, size)
+
+
+def write_all(fd, data):
+    with memoryview(data) as view:
+        written = 0
+        while written < len(view):
+            written += os.write(fd, view[written:])
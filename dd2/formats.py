@@ -0,0 +1,155 @@
+"""
+Declarative descriptions of the archive formats.
+
+Every fixed-size structure - the SBK header and index slot, the DIRINFO
+header block - is written down once here as a Record, a list of
+(field name, struct code) pairs, and compiled once into a struct.Struct
+that the readers and writers share. Padding is listed with a None name and
+an 'x' code. A format descriptor bundles the records of one archive variant
+together with its other constants, so a variant with a different header
+size only needs a new descriptor, not a forked tool:
+
+    DIRINFO                  the Destruction Derby 2 layout (header table below 0xAA0)
+    DIRINFO_EXTENDED         the same blocks, but the table may run up to the first member
+"""
+import math
+import struct
+
+
+class Record:
+    """A fixed-size little-endian record compiled into one Struct."""
+
+    def __init__(self, fields):
+        self.layout = tuple(fields)
+        self.fields = tuple(name for name, code in fields if name is not None)
+        self.codes = tuple(code for name, code in fields)
+        self.struct = struct.Struct('<' + ''.join(self.codes))
+        self.size = self.struct.size
+        # Where each named field starts, and where the last one ends (trailing padding excluded)
+        self.offsets = {}
+        position = 0
+        for name, code in fields:
+            field_size = struct.calcsize('<' + code)
+            if name is not None:
+                self.offsets[name] = position
+                self.data_size = position + field_size
+            position += field_size
+
+    def decode(self, data, offset=0):
+        return self.struct.unpack_from(data, offset)
+
+    def iter_decode(self, table):
+        return self.struct.iter_unpack(table)
+
+    def encode(self, *values):
+        return self.struct.pack(*values)
+
+    def numpy_dtype(self, numpy):
+        """The equivalent structured dtype; byte strings and padding become void fields."""
+        kinds = {'B': '<u1', 'H': '<u2', 'I': '<u4', 'Q': '<u8'}
+        dtype = []
+        for i, (name, code) in enumerate(self.layout):
+            count, kind = int(code[:-1] or 1), code[-1]
+            if kind in 'sx':
+                dtype.append((name or f'_padding{i}', f'V{count}'))
+            else:
+                dtype.append((name, kinds[kind]))
+        return numpy.dtype(dtype)
+
+
+class SBKFormat:
+    """
+    An SBK sound bank: a header with the archive size and the entry count,
+    then one index slot per sound, then the RIFF files.
+    """
+
+    def __init__(self, header, slot, size_field_mask):
+        self.header = header
+        self.slot = slot
+        self.size_field_mask = size_field_mask
+
+    def decode_header(self, data):
+        """Returns (size field, entry count) of the header at the start of `data`."""
+        if len(data) < self.header.size:
+            raise ValueError("File is too small to contain a valid header.")
+        size_field, file_count = self.header.decode(data)
+        return size_field & self.size_field_mask, file_count
+
+    def encode_header(self, archive_size, file_count):
+        return self.header.encode(archive_size & self.size_field_mask, file_count)
+
+    def data_start(self, file_count):
+        return self.header.size + file_count * self.slot.size
+
+
+class DirinfoFormat:
+    """
+    A DIRINFO archive: a table of fixed-size header blocks (name, sector,
+    size) followed by the members, each starting on a sector boundary. The
+    name field is as long for every block, but only its first
+    `name_lengths.get(block, default_name_length)` bytes hold the name; the
+    rest is padding. `header_end` is where the table stops; None means it
+    runs up to the first sector a member uses, so it can hold any number of
+    blocks.
+    """
+
+    def __init__(self, name, name_field, name_lengths, default_name_length, sector_size, header_end):
+        self.name = name
+        self.location = Record((('sector', 'H'), ('size', 'I')))
+        self.block = Record((('name', f'{name_field}s'),) + tuple(zip(('sector', 'size'), self.location.codes)))
+        self.location_offset = self.block.offsets['sector']
+        self.name_lengths = dict(name_lengths)
+        self.default_name_length = default_name_length
+        self.sector_size = sector_size
+        self.header_end = header_end
+        # One precompiled encoder per name length, so building a block is a single pack() call
+        self._block_encoders = {}
+        for length in set(self.name_lengths.values()) | {default_name_length}:
+            self._block_encoders[length] = struct.Struct(f'<{length}s{name_field - length}x' + ''.join(self.location.codes))
+
+    def name_length(self, block_index):
+        return self.name_lengths.get(block_index, self.default_name_length)
+
+    def encode_block(self, block_index, name, sector, size):
+        """Packs one header block; `name` is truncated or null-padded to the block's name length."""
+        return self._block_encoders[self.name_length(block_index)].pack(name.encode('ascii'), sector, size)
+
+    def table_end(self, block_count):
+        """Where the data may start behind a table of `block_count` blocks."""
+        table_size = block_count * self.block.size
+        if self.header_end is None:
+            return table_size
+        if block_count > self.max_blocks:
+            raise ValueError(f"{block_count} files do not fit in the {self.name} header "
+                             f"(at most {self.max_blocks}). Use a variant with a larger header, such as extended.")
+        # The last block may start just before header_end and run past it
+        return max(self.header_end, table_size)
+
+    @property
+    def max_blocks(self):
+        """How many blocks start before header_end, or None when the table has no fixed end."""
+        return None if self.header_end is None else math.ceil(self.header_end / self.block.size)
+
+    def first_sector(self, block_count):
+        return math.ceil(self.table_end(block_count) / self.sector_size)
+
+
+SBK = SBKFormat(
+    header=Record(((None, '8x'), ('size_field', 'I'), ('file_count', 'H'), (None, '2x'))),
+    slot=Record((('absolute_offset', 'I'), ('block_size', 'I'), ('duration_flag', 'I'),
+                 ('sample_rate', 'I'), ('unknown_flag', 'I'), (None, '8x'))),
+    # Only the low three bytes of the size field are used by the original banks
+    size_field_mask=0xFFFFFF,
+)
+
+DIRINFO = DirinfoFormat(
+    'dd2', name_field=18, name_lengths={0: 17, 1: 17, 11: 16}, default_name_length=14,
+    sector_size=2048, header_end=0xAA0,
+)
+
+DIRINFO_EXTENDED = DirinfoFormat(
+    'extended', name_field=18, name_lengths={0: 17, 1: 17, 11: 16}, default_name_length=14,
+    sector_size=2048, header_end=None,
+)
+
+DIRINFO_VARIANTS = {variant.name: variant for variant in (DIRINFO, DIRINFO_EXTENDED)}
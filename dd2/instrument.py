@@ -0,0 +1,187 @@
+"""
+Phase timers, counters and optional profiling for one run of a tool.
+
+The pack and unpack functions mark their phases and count what they move:
+
+    with instrument.phase("walk"):
+        all_files = scan_tree(input_dir)
+    instrument.count("bytes_written", size)
+
+Outside of a recording these calls do nothing. The command line wraps every
+subcommand in recording(), so its --report FILE option gets a JSON report
+with the time spent per phase, the counters and the overall throughput,
+and --profile adds a cProfile function table and tracemalloc's allocation
+peak to it. Phase times and counters are collected from every thread;
+cProfile only sees the thread that started the recording.
+"""
+import os
+import time
+import threading
+from contextlib import contextmanager, nullcontext
+
+REPORT_VERSION = 1
+PROFILE_FUNCTIONS = 25
+MEMORY_SITES = 10
+
+
+class Recorder:
+    """Collects the phase times and counters of one run."""
+
+    def __init__(self, name):
+        self.name = name
+        self.phases = {}
+        self.counters = {}
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                seconds, calls = self.phases.get(name, (0.0, 0))
+                self.phases[name] = (seconds + elapsed, calls + 1)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+
+class _NullRecorder:
+    def phase(self, name):
+        return nullcontext()
+
+    def count(self, name, amount=1):
+        pass
+
+
+_NULL = _NullRecorder()
+_current = _NULL
+
+
+def phase(name):
+    """A context manager that adds the time spent inside it to the phase `name` of the current recording."""
+    return _current.phase(name)
+
+
+def count(name, amount=1):
+    """Adds `amount` to the counter `name` of the current recording."""
+    _current.count(name, amount)
+
+
+def _profile_table(profiler):
+    import pstats
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, function), (primitive_calls, calls, total, cumulative, callers) in stats.stats.items():
+        rows.append({'function': f"{os.path.basename(filename)}:{line}({function})" if line else function,
+                     'calls': calls, 'total_seconds': round(total, 6), 'cumulative_seconds': round(cumulative, 6)})
+    rows.sort(key=lambda row: row['cumulative_seconds'], reverse=True)
+    return rows[:PROFILE_FUNCTIONS]
+
+
+def _memory_table(snapshot, peak):
+    sites = []
+    for statistic in snapshot.statistics('lineno')[:MEMORY_SITES]:
+        frame = statistic.traceback[0]
+        sites.append({'location': f"{os.path.basename(frame.filename)}:{frame.lineno}",
+                      'size_bytes': statistic.size, 'blocks': statistic.count})
+    return {'peak_bytes': peak, 'largest_live_sites': sites}
+
+
+def build_report(recorder, error=None, context=None, profile=None):
+    from datetime import datetime, timezone
+    seconds = recorder.elapsed()
+    moved_bytes = max(recorder.counters.get('bytes_read', 0), recorder.counters.get('bytes_written', 0))
+    report = {
+        'version': REPORT_VERSION,
+        'tool': recorder.name,
+        'started': datetime.fromtimestamp(recorder.started, timezone.utc).isoformat(timespec='seconds'),
+        'seconds': round(seconds, 6),
+        'phases': {name: {'seconds': round(phase_seconds, 6), 'calls': calls}
+                   for name, (phase_seconds, calls) in recorder.phases.items()},
+        'counters': dict(recorder.counters),
+        'mb_per_second': round(moved_bytes / seconds / (1024 * 1024), 3) if seconds > 0 else 0.0,
+        'context': context or {},
+        'error': error,
+    }
+    if profile is not None:
+        report['profile'] = profile
+    return report
+
+
+def write_report(report, path):
+    import json
+    temporary_path = path + ".tmp"
+    with open(temporary_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    os.replace(temporary_path, path)
+
+
+def describe(report):
+    """The report as a few lines of text, for --profile without --report."""
+    lines = [f"{report['tool']}: {report['seconds']:.3f} s, {report['mb_per_second']:.1f} MB/s"]
+    for name, phase_report in sorted(report['phases'].items(), key=lambda item: -item[1]['seconds']):
+        lines.append(f"  {name:<24} {phase_report['seconds']:10.3f} s  ({phase_report['calls']} calls)")
+    for name, value in sorted(report['counters'].items()):
+        lines.append(f"  {name:<24} {value:>12}")
+    profile = report.get('profile')
+    if profile:
+        lines.append(f"  peak traced memory       {profile['memory']['peak_bytes']:>12} B")
+        lines.append("  slowest functions (cumulative):")
+        for row in profile['functions'][:10]:
+            lines.append(f"    {row['cumulative_seconds']:10.3f} s  {row['calls']:>8}  {row['function']}")
+    return "\n".join(lines)
+
+
+@contextmanager
+def recording(name, profile=False, report_path=None, context=None, log=None):
+    """
+    Records phases and counters of everything run inside it. With `profile`
+    the run is also profiled with cProfile and tracemalloc. At the end the
+    report is written to `report_path` as JSON when given, and passed to
+    `log` as text when given. The report is also produced when the run fails.
+    """
+    global _current
+    recorder = Recorder(name)
+    previous = _current
+    _current = recorder
+    profiler = None
+    if profile:
+        # The profiler stack is only loaded for a profiled run
+        import cProfile
+        import tracemalloc
+        tracemalloc.start()
+        profiler = cProfile.Profile()
+        profiler.enable()
+    error = None
+    try:
+        yield recorder
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        profile_report = None
+        if profiler is not None:
+            profiler.disable()
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            profile_report = {'functions': _profile_table(profiler), 'memory': _memory_table(snapshot, peak)}
+        _current = previous
+        report = build_report(recorder, error, context, profile_report)
+        if report_path:
+            try:
+                write_report(report, report_path)
+            except OSError as e:
+                import sys
+                print(f"Could not write the report {report_path}: {e}", file=sys.stderr)
+        if log is not None:
+            log(describe(report))
@@ -0,0 +1,171 @@
+"""
+Writes a planned sector layout to disk front to back.
+
+The DIRINFO packer knows every member's sector before it writes a byte, so
+the whole archive - header table, members and the zero padding between
+them - is streamed in file order through one page-aligned buffer. Runs of
+small members are coalesced into BUFFER_SIZE writes, every write starts at
+a multiple of BUFFER_SIZE, and nothing is left to the OS to fill in behind
+a seek, which keeps packing onto slow or network disks sequential.
+
+By default the file is reserved up front with posix_fallocate. With
+preallocate=False it is only truncated to its final size instead, and
+padding that covers whole filesystem blocks is skipped over, so it stays a
+hole that reads back as zeros. Writing then resumes at the filesystem block
+boundary that ends the hole, so writes are only aligned to the filesystem
+block size. A packed DIRINFO only pads the end of each member's last
+sector, less than 2048 bytes, so on filesystems with 4 KiB or larger blocks
+no hole ever appears and skipping the reservation is the only difference.
+"""
+import os
+import mmap
+
+from dd2 import fastio
+from dd2.progress import no_progress, never_cancel, check_cancel
+
+BUFFER_SIZE = 4 * 1024 * 1024
+DEFAULT_BLOCK_SIZE = 4096
+
+
+class LayoutStats:
+    """What a layout is made of, and how it was written."""
+
+    __slots__ = ('archive_size', 'header_bytes', 'payload_bytes', 'hole_bytes', 'write_calls')
+
+    def __init__(self, archive_size, header_bytes, payload_bytes, hole_bytes=0, write_calls=0):
+        self.archive_size = archive_size
+        self.header_bytes = header_bytes
+        self.payload_bytes = payload_bytes
+        self.hole_bytes = hole_bytes
+        self.write_calls = write_calls
+
+    @property
+    def padding_bytes(self):
+        return self.archive_size - self.header_bytes - self.payload_bytes
+
+    @property
+    def padding_ratio(self):
+        return self.padding_bytes / self.archive_size if self.archive_size else 0.0
+
+    def describe(self):
+        text = (f"Layout: {self.payload_bytes} B of file data, {self.header_bytes} B of header, "
+                f"{self.padding_bytes} B of padding ({self.padding_ratio:.2%} of the archive)")
+        if self.hole_bytes:
+            text += f", {self.hole_bytes} B of it left as holes"
+        return text + "."
+
+
+class _SequentialWriter:
+    """
+    Collects bytes for consecutive file offsets in a page-aligned buffer and
+    writes it out when full. The file offset of each write is a multiple of
+    the buffer size until a hole is skipped, and a multiple of `hole_size`
+    after that.
+    """
+
+    def __init__(self, fd, buffer_size, hole_size):
+        self.fd = fd
+        # An anonymous mapping is page-aligned, unlike a bytearray
+        self.buffer = mmap.mmap(-1, buffer_size)
+        self.view = memoryview(self.buffer)
+        self.zeros = memoryview(bytes(buffer_size))
+        self.filled = 0
+        self.buffer_offset = 0
+        self.hole_size = hole_size
+        self.hole_bytes = 0
+        self.write_calls = 0
+
+    @property
+    def position(self):
+        return self.buffer_offset + self.filled
+
+    def close(self):
+        self.view.release()
+        self.zeros.release()
+        self.buffer.close()
+
+    def flush(self):
+        if self.filled:
+            fastio.write_at(self.fd, self.view[:self.filled], self.buffer_offset)
+            self.write_calls += 1
+            self.buffer_offset += self.filled
+            self.filled = 0
+
+    def _space(self):
+        if self.filled == len(self.buffer):
+            self.flush()
+        return len(self.buffer) - self.filled
+
+    def write(self, data):
+        with memoryview(data) as data:
+            position = 0
+            while position < len(data):
+                count = min(self._space(), len(data) - position)
+                self.view[self.filled:self.filled + count] = data[position:position + count]
+                self.filled += count
+                position += count
+
+    def copy_file(self, path, size):
+        """Reads the first `size` bytes of `path` straight into the buffer."""
+        with open(path, 'rb', buffering=0) as f_in:
+            remaining = size
+            while remaining:
+                count = min(self._space(), remaining)
+                read = f_in.readinto(self.view[self.filled:self.filled + count])
+                if not read:
+                    raise ValueError(f"{path} is shorter than planned ({size - remaining} of {size} B).")
+                self.filled += read
+                remaining -= read
+
+    def pad_to(self, end):
+        """Zero-fills up to the file offset `end`; whole blocks are skipped when holes are allowed."""
+        if end < self.position:
+            raise ValueError(f"Layout overlaps itself at offset 0x{end:X}.")
+        if self.hole_size:
+            hole_start = -(-self.position // self.hole_size) * self.hole_size
+            hole_end = end // self.hole_size * self.hole_size
+            if hole_end > hole_start:
+                self._fill_zeros(hole_start)
+                self.flush()
+                self.buffer_offset = hole_end
+                self.hole_bytes += hole_end - hole_start
+        self._fill_zeros(end)
+
+    def _fill_zeros(self, end):
+        while self.position < end:
+            count = min(self._space(), end - self.position)
+            self.view[self.filled:self.filled + count] = self.zeros[:count]
+            self.filled += count
+
+
+def write_layout(fd, header_data, write_tasks, archive_size, progress=no_progress, cancel=never_cancel, preallocate=True):
+    """
+    Writes `header_data` at offset 0 and the files of `write_tasks` - (write
+    offset, path, size) tuples - at their offsets into the empty file behind
+    `fd`, zero-padding every gap, so the file ends up `archive_size` bytes
+    long. Returns the LayoutStats of the written layout.
+    """
+    if preallocate:
+        fastio.preallocate(fd, archive_size)
+        hole_size = 0
+    else:
+        os.ftruncate(fd, archive_size)
+        hole_size = getattr(os.fstat(fd), 'st_blksize', 0) or DEFAULT_BLOCK_SIZE
+
+    tasks = sorted(write_tasks, key=lambda task: task[0])
+    total_bytes = sum(size for offset, path, size in tasks)
+    written_bytes = 0
+    writer = _SequentialWriter(fd, BUFFER_SIZE, hole_size)
+    try:
+        writer.write(header_data)
+        for offset, path, size in tasks:
+            check_cancel(cancel)
+            writer.pad_to(offset)
+            writer.copy_file(path, size)
+            written_bytes += size
+            progress(written_bytes, total_bytes)
+        writer.pad_to(archive_size)
+        writer.flush()
+    finally:
+        writer.close()
+    return LayoutStats(archive_size, len(header_data), total_bytes, writer.hole_bytes, writer.write_calls)
@@ -0,0 +1,256 @@
+"""
+Checksum manifests of unpacked archives (.dd2manifest.json).
+
+With manifest=True the unpackers hash every member while copying it, so the
+manifest costs no second read. It records the source archive and, for each
+member, its name, offset, size, DIRINFO sector, CRC32 and BLAKE2b. verify()
+later checks an extracted folder or the archive itself against it. An
+incremental unpack uses the manifest of the previous run to leave unchanged
+outputs alone:
+
+    python -m dd2 sbk unpack BANK1.SBK sounds --manifest
+    python -m dd2 verify sounds
+    python -m dd2 verify sounds --archive BANK1.SBK
+    python -m dd2 sbk unpack BANK1.SBK sounds --incremental
+"""
+import os
+import json
+import zlib
+import hashlib
+
+from dd2 import fastio
+
+MANIFEST_NAME = ".dd2manifest.json"
+MANIFEST_VERSION = 1
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+
+class Crc32:
+    """zlib.crc32 behind the update()/hexdigest() interface of hashlib objects."""
+
+    def __init__(self):
+        self.value = 0
+
+    def update(self, data):
+        self.value = zlib.crc32(data, self.value)
+
+    def hexdigest(self):
+        return f"{self.value:08x}"
+
+
+def new_hashers():
+    return Crc32(), hashlib.blake2b()
+
+
+def member_record(name, offset, size, hashers, sector=None, mtime_ns=None):
+    crc, blake = hashers
+    record = {'name': name, 'offset': offset, 'size': size}
+    if sector is not None:
+        record['sector'] = sector
+    record['crc32'] = crc.hexdigest()
+    record['blake2b'] = blake.hexdigest()
+    if mtime_ns is not None:
+        # When the output was last written; lets the next incremental unpack trust a stat
+        record['mtime_ns'] = mtime_ns
+    return record
+
+
+def build(archive_format, archive_path, members):
+    stat = os.stat(archive_path)
+    return {
+        'version': MANIFEST_VERSION,
+        'format': archive_format,
+        'archive': {'path': os.path.abspath(archive_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns},
+        'members': members,
+    }
+
+
+def save(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    text = json.dumps(manifest, indent=1)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if f.read() == text:
+                # Nothing changed - keep the file and its mtime as they are
+                return path
+    except (OSError, UnicodeDecodeError):
+        pass
+    temporary_path = path + ".tmp"
+    with open(temporary_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temporary_path, path)
+    return path
+
+
+def load(path):
+    """Loads the manifest at `path`, or the one inside the folder `path`."""
+    if os.path.isdir(path):
+        path = os.path.join(path, MANIFEST_NAME)
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported manifest version in {path}.")
+    return manifest
+
+
+def member_path(output_dir, name):
+    """Where an unpack puts the member `name` below `output_dir`."""
+    return os.path.join(output_dir, name)
+
+
+class PreviousRun:
+    """
+    The manifest an earlier unpack left in `output_dir`. As long as the
+    archive still has the size and mtime recorded there, an output whose size
+    and mtime match its record is known to be up to date without reading it.
+    """
+
+    def __init__(self, output_dir, archive_format, archive_path):
+        self.records = {}
+        self.archive_unchanged = False
+        try:
+            manifest = load(os.path.join(output_dir, MANIFEST_NAME))
+        except (OSError, ValueError):
+            return
+        if manifest.get('format') != archive_format:
+            return
+        stat = os.stat(archive_path)
+        archive = manifest.get('archive', {})
+        self.archive_unchanged = (archive.get('size') == stat.st_size and archive.get('mtime_ns') == stat.st_mtime_ns)
+        self.records = {record['name']: record for record in manifest.get('members', [])}
+
+    def unchanged(self, name, offset, size, output_path):
+        """Returns the old record when the output is known to be current, otherwise None."""
+        record = self.records.get(name)
+        if (not self.archive_unchanged or record is None or 'mtime_ns' not in record
+                or record['offset'] != offset or record['size'] != size):
+            return None
+        try:
+            stat = os.stat(output_path)
+        except OSError:
+            return None
+        if stat.st_size == size and stat.st_mtime_ns == record['mtime_ns']:
+            return record
+        return None
+
+
+def _same_content(src_fd, view, offset, size, output_path, hashers):
+    """
+    True when `output_path` holds exactly the `size` archive bytes at
+    `offset`. The archive bytes compared are fed to `hashers`.
+    """
+    try:
+        f = open(output_path, 'rb', buffering=0)
+    except OSError:
+        return False
+    with f:
+        if os.fstat(f.fileno()).st_size != size:
+            return False
+        position = 0
+        while position < size:
+            count = min(fastio.CHUNK_SIZE, size - position)
+            start = offset + position
+            chunk = view[start:start + count] if view is not None else fastio.read_at(src_fd, count, start)
+            if len(chunk) != count or f.read(count) != chunk:
+                return False
+            for hasher in hashers:
+                hasher.update(chunk)
+            position += count
+    return True
+
+
+def extract_member(src_fd, output_path, name, offset, size, view=None, previous=None, hash_member=False, sector=None):
+    """
+    Copies one member to `output_path` and returns (manifest record or None,
+    whether the file was written). With `previous` (a PreviousRun) the
+    output is left alone when it is already current: trusted from a stat when
+    the previous manifest vouches for it, otherwise after comparing its bytes.
+    """
+    if previous is not None:
+        record = previous.unchanged(name, offset, size, output_path)
+        if record is not None:
+            return record, False
+        hashers = new_hashers()
+        if _same_content(src_fd, view, offset, size, output_path, hashers):
+            return member_record(name, offset, size, hashers, sector, os.stat(output_path).st_mtime_ns), False
+
+    with open(output_path, 'wb') as out:
+        if not (hash_member or previous is not None):
+            fastio.copy_range(src_fd, out.fileno(), offset, size, view)
+            return None, True
+        hashers = new_hashers()
+        fastio.copy_range_hashed(src_fd, out.fileno(), offset, size, hashers, view)
+    return member_record(name, offset, size, hashers, sector, os.stat(output_path).st_mtime_ns), True
+
+
+def _hash_range(fd, offset, size):
+    hashers = new_hashers()
+    position = offset
+    end = offset + size
+    while position < end:
+        chunk = fastio.read_at(fd, min(fastio.CHUNK_SIZE, end - position), position)
+        if not chunk:
+            break
+        for hasher in hashers:
+            hasher.update(chunk)
+        position += len(chunk)
+    return position - offset, hashers
+
+
+def _check_file(output_dir, record):
+    path = member_path(output_dir, record['name'])
+    try:
+        with open(path, 'rb', buffering=0) as f:
+            size = os.fstat(f.fileno()).st_size
+            if size != record['size']:
+                return f"{record['name']}: size is {size} B, expected {record['size']} B"
+            read, hashers = _hash_range(f.fileno(), 0, size)
+    except OSError as e:
+        return f"{record['name']}: {e.strerror or e}"
+    return _compare(record, read, hashers)
+
+
+def _check_range(fd, record):
+    read, hashers = _hash_range(fd, record['offset'], record['size'])
+    return _compare(record, read, hashers)
+
+
+def _compare(record, read, hashers):
+    if read != record['size']:
+        return f"{record['name']}: only {read} of {record['size']} B could be read"
+    crc, blake = hashers
+    if crc.hexdigest() != record['crc32'] or blake.hexdigest() != record['blake2b']:
+        return f"{record['name']}: checksum mismatch"
+    return None
+
+
+def verify(manifest_path, archive_path=None, workers=DEFAULT_WORKERS, log=lambda message: None):
+    """
+    Checks the members listed in a manifest, in parallel. Without
+    `archive_path` the extracted files next to the manifest are checked,
+    otherwise the recorded byte ranges of that archive. Returns the list of
+    problems found (empty when everything matches).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    manifest = load(manifest_path)
+    output_dir = manifest_path if os.path.isdir(manifest_path) else os.path.dirname(manifest_path)
+    members = manifest['members']
+
+    if archive_path is not None and not hasattr(os, 'pread'):
+        # Without positional reads the threads could not share the archive descriptor
+        workers = 1
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        if archive_path is None:
+            log(f"Verifying {len(members)} files in {output_dir}...")
+            results = list(pool.map(lambda record: _check_file(output_dir, record), members))
+        else:
+            log(f"Verifying {len(members)} members of {archive_path}...")
+            with open(archive_path, 'rb', buffering=0) as f:
+                results = list(pool.map(lambda record: _check_range(f.fileno(), record), members))
+
+    problems = [problem for problem in results if problem]
+    for problem in problems:
+        log(f" ! {problem}")
+    log(f"{len(members) - len(problems)} of {len(members)} members OK.")
+    return problems
@@ -0,0 +1,244 @@
+"""
+Waveform peaks of the sounds in an SBK bank, for thumbnails and previews.
+
+A sound's peaks are PEAK_BUCKETS bytes: the loudest absolute sample of each
+equal slice of the sound, scaled to 0..255 of full scale. They are decoded
+straight from the RIFF payload inside the bank (an mmap, or bytes) through
+memoryview slices - with NumPy when it is installed, otherwise with
+array.array - and kept in a sidecar next to the bank
+(BANK1.SBK.dd2peaks.json) keyed by each payload's offset and size.
+
+The sidecar also records the bank's size and mtime. While those match, a
+cached waveform is used without reading its payload, so reopening an
+unchanged bank touches nothing but the index. Once the bank has changed,
+each cached waveform is checked against the BLAKE2b hash of its payload
+before it is used, and the new size and mtime are written back.
+"""
+import os
+import sys
+import json
+import struct
+import hashlib
+from array import array
+
+PEAK_BUCKETS = 64
+CACHE_SUFFIX = ".dd2peaks.json"
+CACHE_VERSION = 2
+SPARK_CHARACTERS = " ▁▂▃▄▅▆▇█"
+
+_FORMAT_PCM = 0x0001
+_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def find_samples(data, offset, size):
+    """
+    Walks the RIFF chunks of the WAVE file held in data[offset:offset + size].
+    Returns (channels, bits per sample, start of the samples in `data`,
+    byte count of the samples); raises ValueError if it is not a PCM file.
+    """
+    end = offset + size
+    if size < 12 or data[offset:offset + 4] != b'RIFF' or data[offset + 8:offset + 12] != b'WAVE':
+        raise ValueError("payload does not start with a RIFF id")
+    fmt = None
+    position = offset + 12
+    while position + 8 <= end:
+        chunk_id, chunk_size = struct.unpack_from('<4sI', data, position)
+        body = position + 8
+        if chunk_id == b'fmt ':
+            if chunk_size < 16 or body + 16 > end:
+                raise ValueError("fmt chunk is too short")
+            fmt = struct.unpack_from('<HHIIHH', data, body)
+        elif chunk_id == b'data':
+            if fmt is None:
+                raise ValueError("data chunk before fmt chunk")
+            format_tag, channels, sample_rate, byte_rate, block_align, bits_per_sample = fmt
+            if format_tag not in (_FORMAT_PCM, _FORMAT_EXTENSIBLE) or bits_per_sample not in (8, 16):
+                raise ValueError(f"only 8- and 16-bit PCM is supported (format {format_tag}, {bits_per_sample} bits)")
+            if channels <= 0:
+                raise ValueError("bad channel count")
+            # A data chunk running past the payload is cut short
+            return channels, bits_per_sample, body, min(chunk_size, end - body)
+        # Chunks are padded to an even size
+        position = body + chunk_size + (chunk_size & 1)
+    raise ValueError("fmt chunk and/or data chunk missing")
+
+
+def _bucket_bounds(frame_count, buckets):
+    return [frame_count * bucket // buckets for bucket in range(buckets + 1)]
+
+
+def _peaks_numpy(numpy, data, channels, bits, start, byte_count, buckets):
+    sample_size = bits // 8
+    frame_count = byte_count // (channels * sample_size)
+    if bits == 16:
+        samples = numpy.frombuffer(data, dtype='<i2', count=frame_count * channels, offset=start)
+        levels = numpy.abs(samples.astype(numpy.int32))
+        full_scale = 32768
+    else:
+        samples = numpy.frombuffer(data, dtype=numpy.uint8, count=frame_count * channels, offset=start)
+        levels = numpy.abs(samples.astype(numpy.int16) - 128)
+        full_scale = 128
+    if channels > 1:
+        levels = levels.reshape(frame_count, channels).max(axis=1)
+
+    bounds = numpy.array(_bucket_bounds(frame_count, buckets))
+    starts = bounds[:-1]
+    # reduceat needs indices inside the array; empty buckets are zeroed below
+    maxima = numpy.maximum.reduceat(levels, numpy.minimum(starts, frame_count - 1))
+    maxima[bounds[1:] == starts] = 0
+    return bytes((numpy.minimum(maxima, full_scale) * 255 // full_scale).astype(numpy.uint8))
+
+
+def _peaks_array(data, channels, bits, start, byte_count, buckets):
+    sample_size = bits // 8
+    frame_count = byte_count // (channels * sample_size)
+    samples = array('h' if bits == 16 else 'B')
+    samples.frombytes(data[start:start + frame_count * channels * sample_size])
+    if bits == 16:
+        if sys.byteorder == 'big':
+            samples.byteswap()
+        center, full_scale = 0, 32768
+    else:
+        center, full_scale = 128, 128
+
+    bounds = _bucket_bounds(frame_count, buckets)
+    peaks = bytearray(buckets)
+    for bucket in range(buckets):
+        first, last = bounds[bucket] * channels, bounds[bucket + 1] * channels
+        if first == last:
+            continue
+        piece = samples[first:last]
+        level = max(max(piece) - center, center - min(piece))
+        peaks[bucket] = min(level, full_scale) * 255 // full_scale
+    return bytes(peaks)
+
+
+def compute_peaks(data, offset, size, buckets=PEAK_BUCKETS):
+    """Returns the peaks (`buckets` bytes) of the WAVE file held in data[offset:offset + size]."""
+    channels, bits, start, byte_count = find_samples(data, offset, size)
+    if byte_count < channels * (bits // 8):
+        return bytes(buckets)
+    numpy = _numpy()
+    if numpy is not None:
+        return _peaks_numpy(numpy, data, channels, bits, start, byte_count, buckets)
+    return _peaks_array(data, channels, bits, start, byte_count, buckets)
+
+
+def payload_digest(data, offset, size):
+    return hashlib.blake2b(memoryview(data)[offset:offset + size], digest_size=16).hexdigest()
+
+
+def sparkline(peaks, width=16):
+    """Draws `peaks` as a line of `width` block characters."""
+    if not peaks:
+        return ""
+    characters = []
+    for column in range(width):
+        first = column * len(peaks) // width
+        last = max(first + 1, (column + 1) * len(peaks) // width)
+        level = max(peaks[first:last])
+        characters.append(SPARK_CHARACTERS[(level * (len(SPARK_CHARACTERS) - 1) + 254) // 255])
+    return "".join(characters)
+
+
+class PeakCache:
+    """The peaks sidecar of the bank at `bank_path`."""
+
+    def __init__(self, bank_path, buckets=PEAK_BUCKETS):
+        self.path = bank_path + CACHE_SUFFIX
+        self.buckets = buckets
+        self.peaks = {}
+        try:
+            bank_stat = os.stat(bank_path)
+            self.bank_stamp = [bank_stat.st_size, bank_stat.st_mtime_ns]
+        except OSError:
+            self.bank_stamp = None
+        # Whether the bank is the one the sidecar was written for
+        self.trusted = False
+        self.changed = False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return
+        if cache.get('version') == CACHE_VERSION and cache.get('buckets') == buckets:
+            self.peaks = cache.get('peaks', {})
+            self.trusted = self.bank_stamp is not None and cache.get('bank') == self.bank_stamp
+            # The new size and mtime are saved even when every waveform still checks out
+            self.changed = not self.trusted
+
+    @staticmethod
+    def key(offset, size):
+        return f"{offset:x}-{size:x}"
+
+    def get(self, data, offset, size):
+        """The cached peaks of data[offset:offset + size], or None; the payload is only hashed when the bank changed."""
+        record = self.peaks.get(self.key(offset, size))
+        if record is None:
+            return None
+        digest, peaks = record
+        if not self.trusted and digest != payload_digest(data, offset, size):
+            return None
+        return bytes.fromhex(peaks)
+
+    def put(self, data, offset, size, peaks):
+        self.peaks[self.key(offset, size)] = [payload_digest(data, offset, size), peaks.hex()]
+        self.changed = True
+
+    def save(self):
+        """Writes the sidecar if anything was added. Returns False if it could not be written."""
+        if not self.changed:
+            return True
+        temporary_path = self.path + ".tmp"
+        try:
+            with open(temporary_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': CACHE_VERSION, 'buckets': self.buckets, 'bank': self.bank_stamp,
+                           'peaks': self.peaks}, f)
+            os.replace(temporary_path, self.path)
+        except OSError:
+            # E.g. a bank on a read-only disc; the peaks are simply computed again next time
+            return False
+        self.changed = False
+        return True
+
+
+def bank_peaks(data, entries, cache=None, buckets=PEAK_BUCKETS):
+    """
+    Returns {entry index: peaks or None} for the non-empty entries of a bank
+    held in `data` (an mmap or bytes), taking what it can from `cache` (a
+    PeakCache) and adding what had to be computed. Entries that share a
+    payload, as in a deduplicated bank, are decoded once. Sounds that cannot
+    be decoded get None.
+    """
+    results = {}
+    known = {}
+    view = memoryview(data)
+    try:
+        for entry in entries:
+            offset, size = entry.absolute_offset, entry.block_size
+            if size == 0 or offset + size > len(view):
+                continue
+            if (offset, size) not in known:
+                peaks = cache.get(view, offset, size) if cache is not None else None
+                if peaks is None:
+                    try:
+                        peaks = compute_peaks(view[offset:offset + size], 0, size, buckets)
+                    except (ValueError, struct.error):
+                        peaks = None
+                    else:
+                        if cache is not None:
+                            cache.put(view, offset, size, peaks)
+                known[offset, size] = peaks
+            results[entry.index] = known[offset, size]
+    finally:
+        # A mapping cannot be closed while a view of it is alive
+        view.release()
+    return results
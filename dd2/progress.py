@@ -0,0 +1,25 @@
+"""
+Progress and cancellation hooks shared by the pack and unpack functions.
+
+They all take `progress(done_bytes, total_bytes)`, called after each member,
+and `cancel()`, polled between members; when it returns True the operation
+stops by raising Cancelled. Members are never left half-written in an
+archive that is updated in place.
+"""
+
+
+class Cancelled(Exception):
+    """Raised by a pack or unpack when its `cancel` callback asked it to stop."""
+
+
+def no_progress(done_bytes, total_bytes):
+    pass
+
+
+def never_cancel():
+    return False
+
+
+def check_cancel(cancel):
+    if cancel():
+        raise Cancelled("Cancelled by the user.")
@@ -0,0 +1,486 @@
+import os
+import re
+import mmap
+import zlib
+import hashlib
+import struct
+from array import array
+
+from dd2 import fastio, tables, manifest, formats, instrument
+from dd2.bankconfig import BankConfig, sound_name
+from dd2.progress import Cancelled, no_progress, never_cancel, check_cancel
+
+FORMAT = formats.SBK
+HEADER_SIZE = FORMAT.header.size
+INDEX_SLOT_SIZE = FORMAT.slot.size # 20 bytes data + 8 bytes padding
+INDEX_ENTRY_SIZE = FORMAT.slot.data_size
+JOURNAL_SUFFIX = ".journal"
+JOURNAL_MAGIC = b'SBKJ'
+WAV_NAME_PATTERN = re.compile(r"sound_(\d+)\.wav$", re.IGNORECASE)
+
+
+def _no_log(message):
+    pass
+
+
+class SBKEntry:
+    """One 28-byte slot of the index table."""
+
+    __slots__ = ('index', 'absolute_offset', 'block_size', 'duration_flag', 'sample_rate', 'unknown_flag')
+
+    def __init__(self, index, absolute_offset, block_size, duration_flag, sample_rate, unknown_flag):
+        self.index = index
+        self.absolute_offset = absolute_offset
+        self.block_size = block_size
+        self.duration_flag = duration_flag
+        self.sample_rate = sample_rate
+        self.unknown_flag = unknown_flag
+
+    def pack(self):
+        return FORMAT.slot.encode(
+            self.absolute_offset, self.block_size, self.duration_flag,
+            self.sample_rate, self.unknown_flag
+        )
+
+
+def read_file_count(data):
+    return FORMAT.decode_header(data)[1]
+
+
+def read_table(data, backend="struct"):
+    """Decodes the index table of a bank held in `data` (bytes or mmap) into columns (see dd2.tables)."""
+    return tables.decode_sbk_index(data, read_file_count(data), backend)
+
+
+def read_index(data, entry_class=SBKEntry):
+    """Parses the header and index table of a bank held in `data` (bytes or mmap)."""
+    return read_table(data).entries(entry_class)
+
+
+def load_columns(data, entry_class=SBKEntry):
+    """
+    Returns (entries, columns) for the editor: the decoded table columns plus
+    an 'index' column, all as mutable array('I') so edits and sorts work on them.
+    """
+    table = read_table(data)
+    columns = dict(table.columns, index=array('I', range(len(table))))
+    return table.entries(entry_class), columns
+
+
+def build_header(total_archive_size, num_files):
+    return FORMAT.encode_header(total_archive_size, num_files)
+
+
+def unpack(input_file, output_dir, log=_no_log, warn=None, progress=no_progress, cancel=never_cancel,
+           write_manifest=False, incremental=False):
+    """
+    Extracts every sound of the bank to `output_dir` as sound_NNN.wav and
+    writes their index metadata to config.json. With `write_manifest` each
+    sound is hashed as it is copied and a checksum manifest is saved (see
+    dd2.manifest). With `incremental` only sounds that differ from the files
+    already in `output_dir` are written, and the manifest is always saved.
+    Returns the number of files. See dd2.progress for `progress` and `cancel`.
+    """
+    with open_bank(input_file, log) as f:
+        archive_size = os.fstat(f.fileno()).st_size
+        if archive_size < HEADER_SIZE:
+            raise ValueError("File is too small to contain a valid header.")
+
+        # The bank is mapped instead of read, so each sound goes from the page cache
+        # straight to its output file and memory use does not grow with the bank size.
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as archive_data, \
+                memoryview(archive_data) as archive_view:
+            log(f"Mapped {archive_size / 1024:.2f} KB of data. Parsing index...")
+
+            with instrument.phase("parse"):
+                entries = read_index(archive_data)
+            log(f"Found {len(entries)} entries in the index.")
+
+            os.makedirs(output_dir, exist_ok=True)
+
+            extracted_count = 0
+            config = BankConfig()
+            total_bytes = sum(entry.block_size for entry in entries)
+            done_bytes = 0
+            records = []
+            write_manifest = write_manifest or incremental
+            previous = manifest.PreviousRun(output_dir, 'sbk', input_file) if incremental else None
+            unchanged_count = 0
+
+            for entry in entries:
+                check_cancel(cancel)
+                # Sanity checks
+                if entry.block_size == 0:
+                    log(f" - Skipping entry #{entry.index + 1} (zero size).")
+                    continue
+                if entry.absolute_offset + entry.block_size > archive_size:
+                    log(f" - ERROR: Entry #{entry.index + 1} points outside the file. Stopping.")
+                    if warn:
+                        warn(f"Entry #{entry.index + 1} has invalid data (offset or size is out of bounds). Extraction may be incomplete.")
+                    break
+
+                extracted_count += 1
+                output_filename = sound_name(extracted_count)
+                output_path = os.path.join(output_dir, output_filename)
+
+                # Copy the exact file data using offset and size from the index
+                with instrument.phase("extract"):
+                    record, written = manifest.extract_member(f.fileno(), output_path, output_filename, entry.absolute_offset,
+                                                              entry.block_size, archive_view, previous, write_manifest)
+                if record is not None:
+                    records.append(record)
+
+                config.set(output_filename, entry.duration_flag, entry.sample_rate, entry.unknown_flag)
+
+                instrument.count("bytes_read", entry.block_size)
+                if written:
+                    instrument.count("files_written")
+                    instrument.count("bytes_written", entry.block_size)
+                    log(f" -> Extracted '{output_filename}' (Size: {entry.block_size} B, Offset: 0x{entry.absolute_offset:X}, Flag: {entry.duration_flag}, Hz: {entry.sample_rate})")
+                else:
+                    unchanged_count += 1
+                    instrument.count("files_unchanged")
+                    log(f" -> Unchanged '{output_filename}'")
+                done_bytes += entry.block_size
+                progress(done_bytes, total_bytes)
+
+    # Zapisz konfigurację do pliku JSON
+    try:
+        with instrument.phase("config"):
+            config_path = config.save(output_dir, only_if_changed=incremental)
+        log(f"\n  Konfiguracja zapisana do: {config_path}")
+    except Exception as e:
+        log(f"\n  ! Uwaga: Nie udało się zapisać pliku konfiguracyjnego: {e}")
+
+    if write_manifest:
+        with instrument.phase("manifest"):
+            manifest_path = manifest.save(output_dir, manifest.build('sbk', input_file, records))
+        log(f"Checksum manifest saved to: {manifest_path}")
+
+    if incremental:
+        log(f"{extracted_count - unchanged_count} files written, {unchanged_count} already up to date.")
+    log(f"\nDone! Extracted a total of {extracted_count} files.")
+    return extracted_count
+
+
+def find_wav_files(input_dir):
+    """Returns (number, path) pairs of the sound_NNN.wav files in `input_dir`, sorted numerically."""
+    files_to_pack = []
+    for filename in os.listdir(input_dir):
+        match = WAV_NAME_PATTERN.match(filename)
+        if match:
+            files_to_pack.append((int(match.group(1)), os.path.join(input_dir, filename)))
+    files_to_pack.sort()
+    return files_to_pack
+
+
+def pack(input_dir, output_file, log=_no_log, progress=no_progress, cancel=never_cancel, dedup=False):
+    """
+    Builds a bank from the sound_NNN.wav files (and optional config.json) in
+    `input_dir`. With `dedup`, sounds with identical content are stored once
+    and their index entries share an offset. A cancelled pack removes the
+    incomplete output file. Returns the number of bytes saved by dedup.
+    """
+    log("Step 1: Searching for files...")
+    try:
+        with instrument.phase("walk"):
+            files_to_pack = find_wav_files(input_dir)
+    except Exception as e:
+        raise ValueError(f"Error while reading the folder: {e}") from e
+    if not files_to_pack:
+        raise ValueError(f"No files found with the format 'sound_number.wav' in the folder:\n{input_dir}")
+
+    num_files = len(files_to_pack)
+    log(f"Found {num_files} files to pack.")
+
+    # Pass 1: the offsets only depend on the file sizes, so the whole index is
+    # planned from os.stat and the WAV headers before any sound data is read.
+    log("Step 2: Preparing data...")
+    index_table_size = num_files * INDEX_SLOT_SIZE
+    data_block_start_offset = HEADER_SIZE + index_table_size
+
+    index_entries = []
+    source_paths = []
+
+    current_absolute_offset = data_block_start_offset
+
+    # Sprawdź, czy istnieje config.json w folderze wejściowym - wczytywany jest tylko raz
+    try:
+        config = BankConfig.load(input_dir, log)
+    except Exception as e:
+        log(f"  ! Błąd odczytu config.json: {e}. Używam obliczonych wartości.")
+        config = None
+    if config is not None:
+        log("  Plik config.json znaleziony. Próbuję użyć konfiguracji z niego.")
+    else:
+        log("  Plik config.json nie znaleziony. Obliczam wartości (sample_rate, duration_flag) z plików .wav.")
+
+    # Only the chunk headers of each WAV are read, on a thread pool
+    # Only a pack probes WAV files, so unpack and info do not pay for the thread pool import
+    from dd2 import wavprobe
+    with instrument.phase("probe"):
+        probes = wavprobe.probe_all([path for num, path in files_to_pack])
+
+    for i, ((num, path), (wav_info, probe_error)) in enumerate(zip(files_to_pack, probes)):
+        check_cancel(cancel)
+        file_basename = os.path.basename(path)
+        config_for_file = None
+        unknown_flag = 1
+
+        try:
+            # Próba odczytu konfiguracji z pliku JSON
+            if config is not None:
+                config_for_file = config.get(file_basename)
+                if config_for_file is not None and config_for_file.sample_rate <= 0:
+                    # Prosta walidacja: sample_rate musi być dodatni
+                    log(f"  ! Nieprawidłowy sample_rate w config dla {file_basename}. Używam obliczonej wartości.")
+                    config_for_file = None
+
+            if wav_info is not None:
+                file_size = wav_info.file_size
+                if not wav_info.riff_size_ok:
+                    log(f"  ! {file_basename}: the RIFF size field ({wav_info.riff_size} B) does not match the file size ({file_size} B).")
+            else:
+                file_size = os.stat(path).st_size
+
+            # Jeśli nie ma konfiguracji w JSON, oblicz wartości z pliku WAV
+            if config_for_file is None:
+                if probe_error is not None:
+                    raise probe_error
+                sample_rate = wav_info.sample_rate
+                duration_flag = wav_info.duration_flag
+            else:
+                # Użyj wartości z config.json
+                sample_rate = config_for_file.sample_rate
+                duration_flag = config_for_file.duration_flag
+                unknown_flag = config_for_file.unknown_flag
+                log(f"    [Użyto config.json]")
+
+            # Unknown flag defaults to 1 when config.json does not provide it
+            index_entries.append(SBKEntry(i, current_absolute_offset, file_size, duration_flag, sample_rate, unknown_flag))
+            source_paths.append(path)
+
+            source_info = f"config" if config_for_file else "WAV"
+            log(f" - {file_basename} -> Offset: 0x{current_absolute_offset:X}, Size: {file_size} B, Flag: {duration_flag}, Hz: {sample_rate} [{source_info}]")
+
+            current_absolute_offset += file_size
+
+        except Exception as e:
+            raise ValueError(f"Could not process file {path}:\n{e}") from e
+
+    if dedup:
+        try:
+            with instrument.phase("write"):
+                saved_bytes = _write_deduplicated(output_file, index_entries, source_paths, log, progress, cancel)
+        except Cancelled:
+            os.remove(output_file)
+            raise
+        log("Done! The archive file was created successfully.")
+        return saved_bytes
+
+    log("Step 3: Building header...")
+    total_archive_size = current_absolute_offset
+    header = build_header(total_archive_size, num_files)
+    log(f"Total archive size: {total_archive_size} bytes.")
+
+    # Pass 2: header and index go out first, then every sound is streamed
+    # straight from its WAV file to its planned offset.
+    log("Step 4: Writing file...")
+    done_bytes = 0
+    try:
+        with instrument.phase("write"), open(output_file, 'wb', buffering=0) as f_out:
+            fastio.preallocate(f_out.fileno(), total_archive_size)
+            fastio.write_all(f_out.fileno(), header + b''.join(entry.pack() for entry in index_entries))
+            for entry, path in zip(index_entries, source_paths):
+                check_cancel(cancel)
+                fastio.copy_file_into(path, f_out.fileno(), entry.absolute_offset, entry.block_size)
+                instrument.count("files_written")
+                instrument.count("bytes_written", entry.block_size)
+                done_bytes += entry.block_size
+                progress(done_bytes, total_archive_size - data_block_start_offset)
+    except Cancelled:
+        os.remove(output_file)
+        raise
+    log("Done! The archive file was created successfully.")
+    return 0
+
+
+def _write_deduplicated(output_file, index_entries, source_paths, log, progress, cancel):
+    """
+    Pass 2 of a dedup pack. Every sound is streamed to the end of the data
+    written so far and hashed on the way; when its digest was seen before,
+    its entry is pointed at the earlier copy and the next sound overwrites
+    it. Sounds with a size no other sound has cannot be duplicates and are
+    copied without hashing. The header and index go out last, once the
+    offsets are known. Returns the bytes saved.
+    """
+    log("Step 3: Writing deduplicated sound data...")
+    size_counts = {}
+    for entry in index_entries:
+        size_counts[entry.block_size] = size_counts.get(entry.block_size, 0) + 1
+
+    data_start = HEADER_SIZE + len(index_entries) * INDEX_SLOT_SIZE
+    total_bytes = sum(entry.block_size for entry in index_entries)
+    seen = {}
+    duplicate_count = 0
+    current_offset = data_start
+    done_bytes = 0
+
+    with open(output_file, 'wb', buffering=0) as f_out:
+        fd = f_out.fileno()
+        for entry, path in zip(index_entries, source_paths):
+            check_cancel(cancel)
+            if size_counts[entry.block_size] > 1:
+                digest = hashlib.blake2b(digest_size=20)
+                fastio.copy_file_hashed(path, fd, current_offset, entry.block_size, digest)
+                key = (entry.block_size, digest.digest())
+                original = seen.get(key)
+            else:
+                fastio.copy_file_into(path, fd, current_offset, entry.block_size)
+                key = original = None
+
+            if original is not None:
+                entry.absolute_offset = original.absolute_offset
+                duplicate_count += 1
+                instrument.count("duplicates")
+                log(f" - {os.path.basename(path)} -> same data as entry #{original.index + 1}, Offset: 0x{entry.absolute_offset:X}")
+            else:
+                entry.absolute_offset = current_offset
+                current_offset += entry.block_size
+                if key is not None:
+                    seen[key] = entry
+                instrument.count("files_written")
+                instrument.count("bytes_written", entry.block_size)
+            done_bytes += entry.block_size
+            progress(done_bytes, total_bytes)
+
+        total_archive_size = current_offset
+        # The last duplicate may have been streamed past the real end of the data
+        os.ftruncate(fd, total_archive_size)
+        log("Step 4: Writing header and index...")
+        fastio.write_at(fd, build_header(total_archive_size, len(index_entries))
+                        + b''.join(entry.pack() for entry in index_entries), 0)
+
+    saved_bytes = data_start + total_bytes - total_archive_size
+    log(f"Total archive size: {total_archive_size} bytes.")
+    log(f"Deduplication: {duplicate_count} duplicate sounds share data, {saved_bytes} bytes saved "
+        f"({100.0 * saved_bytes / (data_start + total_bytes):.1f}%).")
+    return saved_bytes
+
+
+def save_as(source_data, entries, save_path):
+    """
+    Writes a copy of the bank in `source_data` (bytes or mmap) with its index
+    table replaced by `entries`; the header and the sound data are copied
+    unchanged. The copy is written next to `save_path` and moved over it
+    once complete.
+    """
+    temporary_path = save_path + ".tmp"
+    with memoryview(source_data) as source, open(temporary_path, "wb") as f_out:
+        f_out.write(source[0:HEADER_SIZE])
+        f_out.write(b''.join(entry.pack() for entry in entries))
+
+        data_start = HEADER_SIZE + (len(entries) * INDEX_SLOT_SIZE)
+        f_out.write(source[data_start:])
+    os.replace(temporary_path, save_path)
+
+
+def _fsync_directory(path):
+    if os.name != 'nt':
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def patch_index(archive_path, entries):
+    """
+    Rewrites only the index slots of `entries` in the bank at `archive_path`,
+    leaving the header and the sound data alone, so a save costs O(changed
+    entries). The original slots are first written to <archive>.journal and
+    synced; the journal is deleted once the new slots are on disk. If the
+    save is interrupted, recover_journal() puts the old slots back.
+    """
+    journal_path = archive_path + JOURNAL_SUFFIX
+    with open(archive_path, 'r+b', buffering=0) as f:
+        fd = f.fileno()
+        file_count = read_file_count(fastio.read_at(fd, HEADER_SIZE, 0))
+
+        records = []
+        for entry in entries:
+            if not 0 <= entry.index < file_count:
+                raise ValueError(f"Entry #{entry.index + 1} is not part of this archive.")
+            slot_offset = HEADER_SIZE + entry.index * INDEX_SLOT_SIZE
+            records.append(struct.pack('<I', slot_offset) + fastio.read_at(fd, INDEX_ENTRY_SIZE, slot_offset))
+
+        journal = JOURNAL_MAGIC + struct.pack('<I', len(records)) + b''.join(records)
+        journal += struct.pack('<I', zlib.crc32(journal))
+        temporary_path = journal_path + ".tmp"
+        with open(temporary_path, 'wb') as f_journal:
+            f_journal.write(journal)
+            f_journal.flush()
+            os.fsync(f_journal.fileno())
+        os.replace(temporary_path, journal_path)
+        _fsync_directory(journal_path)
+
+        for entry in entries:
+            fastio.write_at(fd, entry.pack()[:INDEX_ENTRY_SIZE], HEADER_SIZE + entry.index * INDEX_SLOT_SIZE)
+        os.fsync(fd)
+
+    os.remove(journal_path)
+    _fsync_directory(journal_path)
+
+
+def recover_journal(archive_path):
+    """
+    Rolls back an index patch that was interrupted before it finished.
+    Returns True when old slots were restored.
+    """
+    journal_path = archive_path + JOURNAL_SUFFIX
+    try:
+        with open(journal_path, 'rb') as f_journal:
+            journal = f_journal.read()
+    except FileNotFoundError:
+        return False
+
+    body, checksum = journal[:-4], journal[-4:]
+    restored = False
+    # A journal that does not check out was never completed, so the archive was not touched yet
+    if len(journal) >= 12 and body.startswith(JOURNAL_MAGIC) and struct.pack('<I', zlib.crc32(body)) == checksum:
+        record_count = struct.unpack_from('<I', body, 4)[0]
+        record_size = 4 + INDEX_ENTRY_SIZE
+        with open(archive_path, 'r+b', buffering=0) as f:
+            for i in range(record_count):
+                position = 8 + i * record_size
+                slot_offset = struct.unpack_from('<I', body, position)[0]
+                fastio.write_at(f.fileno(), body[position + 4:position + record_size], slot_offset)
+            os.fsync(f.fileno())
+        restored = True
+
+    os.remove(journal_path)
+    return restored
+
+
+def open_bank(path, log=_no_log):
+    """
+    Opens the bank at `path` for reading. An index save that was interrupted
+    is rolled back first, so a reader never sees a mix of old and new slots.
+    """
+    try:
+        if recover_journal(path):
+            log(f"The last index save of {os.path.basename(path)} was interrupted; the old index was restored.")
+    except OSError as e:
+        raise ValueError(f"{path} has an unfinished index save ({path}{JOURNAL_SUFFIX}) "
+                         f"that could not be rolled back: {e}") from e
+    return open(path, 'rb')
+
+
+def info(input_file, backend="struct"):
+    """Returns (header size field, index table) without touching the sound data."""
+    with open_bank(input_file) as f:
+        header = f.read(HEADER_SIZE)
+        file_count = read_file_count(header)
+        table = header + f.read(file_count * INDEX_SLOT_SIZE)
+    size_field = FORMAT.decode_header(header)[0]
+    return size_field, read_table(table, backend)
@@ -0,0 +1,232 @@
+"""
+A small local HTTP server for archive members:
+
+    python -m dd2 serve DIRINFO BANK1.SBK --port 8000
+
+    GET /                          JSON list of the served archives
+    GET /<archive>/                JSON list of its members (name, offset, size, url)
+    GET /<archive>/<member path>   the member's bytes; DIRINFO paths use / instead of \\
+
+Member requests honour single byte ranges (206 / 416), If-Range and
+If-None-Match. The ETag is made of the member's offset and size in the
+archive plus the archive's mtime, so it changes when an in-place update moves
+or rewrites a member. Bytes go from the archive to the socket with
+os.sendfile where available; otherwise they are sent from the archive's
+memory mapping. Every request thread shares the same open archives.
+"""
+import os
+import re
+import json
+import mimetypes
+from urllib.parse import quote, unquote, urlsplit
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from dd2 import fastio
+from dd2.archive import DirinfoArchive, SBKArchive
+
+DEFAULT_PORT = 8000
+_RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _no_log(message):
+    pass
+
+
+def open_archive(path):
+    """Opens `path` as an SBK bank when it has the .sbk extension, otherwise as a DIRINFO archive."""
+    if path.lower().endswith('.sbk'):
+        return SBKArchive(path)
+    return DirinfoArchive(path)
+
+
+def parse_range(header, size):
+    """
+    Returns (start, end) - end exclusive - for a single-range Range header,
+    None when the header should be ignored (absent, malformed or several
+    ranges), or raises ValueError when the range cannot be satisfied.
+    """
+    if not header:
+        return None
+    match = _RANGE_PATTERN.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if size == 0:
+        # An empty member has no byte a range could select
+        raise ValueError("range on an empty member")
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - length), size
+    start = int(first)
+    end = size if not last else min(size, int(last) + 1)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError("range starts past the end")
+    return start, end
+
+
+class ArchiveRequestHandler(BaseHTTPRequestHandler):
+    server_version = "dd2-serve/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._handle(send_body=True)
+
+    def do_HEAD(self):
+        self._handle(send_body=False)
+
+    def log_message(self, format, *args):
+        self.server.log(f"{self.address_string()} - {format % args}")
+
+    def _handle(self, send_body):
+        path = unquote(urlsplit(self.path).path)
+        parts = path.strip('/').split('/', 1)
+        archives = self.server.archives
+
+        if parts == ['']:
+            self._send_json({name: f"/{quote(name)}/" for name in archives}, send_body)
+            return
+        archive = archives.get(parts[0])
+        if archive is None:
+            self.send_error(HTTPStatus.NOT_FOUND, "No such archive")
+            return
+        if len(parts) == 1 or not parts[1]:
+            self._send_json(self._listing(parts[0], archive), send_body)
+            return
+
+        member = parts[1]
+        try:
+            offset, size = archive.span(member)
+        except KeyError:
+            self.send_error(HTTPStatus.NOT_FOUND, "No such member")
+            return
+        except ValueError as e:
+            self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR, str(e))
+            return
+        self._send_member(archive, member, offset, size, send_body)
+
+    def _listing(self, archive_name, archive):
+        members = []
+        for name in archive:
+            try:
+                entry_offset, entry_size = archive.span(name)
+            except ValueError as e:
+                # A slot pointing outside the file is listed, but cannot be fetched
+                members.append({'name': name, 'error': str(e)})
+                continue
+            url_path = name.replace('\\', '/')
+            members.append({'name': name, 'offset': entry_offset, 'size': entry_size,
+                            'url': f"/{quote(archive_name)}/{quote(url_path)}"})
+        return {'archive': archive_name, 'members': members}
+
+    def _send_json(self, value, send_body):
+        body = json.dumps(value, indent=2).encode('utf-8')
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _send_member(self, archive, member, offset, size, send_body):
+        mtime_ns = os.fstat(archive.fileno()).st_mtime_ns
+        etag = f'"{offset:x}-{size:x}-{mtime_ns:x}"'
+
+        if etag in [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        byte_range = None
+        if_range = self.headers.get("If-Range")
+        if if_range is None or if_range.strip() == etag:
+            try:
+                byte_range = parse_range(self.headers.get("Range"), size)
+            except ValueError:
+                self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+        start, end = byte_range or (0, size)
+        self.send_response(HTTPStatus.PARTIAL_CONTENT if byte_range else HTTPStatus.OK)
+        content_type = mimetypes.guess_type(member.replace('\\', '/'))[0] or "application/octet-stream"
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(end - start))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        if byte_range:
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{size}")
+        self.end_headers()
+        if send_body:
+            try:
+                self._send_bytes(archive, member, offset + start, end - start)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client went away (e.g. a media element seeking elsewhere)
+                self.close_connection = True
+
+    def _send_bytes(self, archive, member, offset, count):
+        self.wfile.flush()
+        if hasattr(os, 'sendfile'):
+            sock_fd = self.connection.fileno()
+            try:
+                while count > 0:
+                    sent = os.sendfile(sock_fd, archive.fileno(), offset, count)
+                    if sent == 0:
+                        break
+                    offset += sent
+                    count -= sent
+                return
+            except (BrokenPipeError, ConnectionResetError):
+                raise
+            except OSError:
+                # sendfile is not supported here - send the rest from the mapping below
+                pass
+        member_offset = archive.span(member)[0]
+        with archive.open(member) as stream:
+            stream.seek(offset - member_offset)
+            while count > 0:
+                chunk = stream.read(min(fastio.CHUNK_SIZE, count))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                count -= len(chunk)
+
+
+class ArchiveServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, archives, log=_no_log):
+        self.archives = archives
+        self.log = log
+        super().__init__(address, ArchiveRequestHandler)
+
+
+def serve(paths, host="127.0.0.1", port=DEFAULT_PORT, log=_no_log):
+    """Serves the archives at `paths` until interrupted; each is mounted under its file name."""
+    archives = {}
+    try:
+        for path in paths:
+            name = os.path.basename(path)
+            if name in archives:
+                raise ValueError(f"Two archives are named {name}; serve them separately.")
+            archives[name] = open_archive(path)
+            log(f"Serving {path} ({len(archives[name])} members) at http://{host}:{port}/{quote(name)}/")
+
+        with ArchiveServer((host, port), archives, log) as server:
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                log("Stopped.")
+    finally:
+        for archive in archives.values():
+            archive.close()
@@ -0,0 +1,98 @@
+"""
+Decodes whole index tables in one pass into columns instead of one struct
+call per entry. The default backend uses precompiled Struct objects with
+iter_unpack and returns array.array columns; backend="numpy" maps the table
+with a structured dtype instead (read-only, zero-copy views), when NumPy is
+installed. The record layouts come from the format descriptors in dd2.formats.
+"""
+from array import array
+
+from dd2 import formats
+
+SBK_COLUMNS = formats.SBK.slot.fields
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ValueError("The numpy backend needs NumPy to be installed.") from None
+    return numpy
+
+
+class SBKTable:
+    """The index table of a bank as one column per field."""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.absolute_offset = columns['absolute_offset']
+        self.block_size = columns['block_size']
+        self.duration_flag = columns['duration_flag']
+        self.sample_rate = columns['sample_rate']
+        self.unknown_flag = columns['unknown_flag']
+
+    def __len__(self):
+        return len(self.absolute_offset)
+
+    def entries(self, entry_class):
+        return [entry_class(i, *fields) for i, fields in enumerate(zip(
+            self.absolute_offset, self.block_size, self.duration_flag, self.sample_rate, self.unknown_flag))]
+
+
+class DirTable:
+    """The header blocks of a DIRINFO archive as names, sectors and sizes."""
+
+    def __init__(self, names, sectors, sizes):
+        self.names = names
+        self.sectors = sectors
+        self.sizes = sizes
+
+    def __len__(self):
+        return len(self.names)
+
+
+def decode_sbk_index(data, file_count, backend="struct", sbk_format=formats.SBK):
+    """Decodes `file_count` index slots that follow the header in `data`."""
+    slot = sbk_format.slot
+    header_size = sbk_format.header.size
+    expected_size = file_count * slot.size
+    table = data[header_size:header_size + expected_size]
+    if len(table) < expected_size:
+        # The padding of the last slot may be cut off by the end of the file
+        if len(table) < expected_size - (slot.size - slot.data_size):
+            raise ValueError(f"The index table is truncated (expected {file_count} entries).")
+        table = bytes(table).ljust(expected_size, b'\x00')
+
+    if backend == "numpy":
+        numpy = _numpy()
+        records = numpy.frombuffer(table, dtype=slot.numpy_dtype(numpy), count=file_count)
+        return SBKTable({name: records[name] for name in slot.fields})
+
+    fields = list(zip(*slot.iter_decode(table))) or [()] * len(slot.fields)
+    return SBKTable({name: array('I', column) for name, column in zip(slot.fields, fields)})
+
+
+def decode_dirinfo_header(data, backend="struct", variant=formats.DIRINFO):
+    """
+    Decodes as many whole header blocks as `data` holds. Only the first
+    `variant.name_length(i)` bytes of the name field of block `i` are its
+    name; the rest of that field is padding.
+    """
+    block = variant.block
+    block_count = len(data) // block.size
+    table = data[:block_count * block.size]
+
+    if backend == "numpy":
+        numpy = _numpy()
+        records = numpy.frombuffer(table, dtype=block.numpy_dtype(numpy), count=block_count)
+        raw_names = [bytes(name) for name in records['name']]
+        sectors, sizes = records['sector'], records['size']
+    else:
+        raw_names, sectors, sizes = (list(column) for column in zip(*block.iter_decode(table))) \
+            if block_count else ([], [], [])
+        sectors, sizes = array('H', sectors), array('I', sizes)
+
+    name_length = variant.name_length
+    names = [raw_name[:name_length(i)].split(b'\x00', 1)[0].decode('ascii', errors='replace')
+             for i, raw_name in enumerate(raw_names)]
+    return DirTable(names, sectors, sizes)
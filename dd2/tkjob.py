@@ -0,0 +1,157 @@
+"""
+Runs a pack or unpack on a worker thread for the Tk tools.
+
+The worker never touches Tk. Log lines go into a queue and the latest
+progress into a plain attribute; the Tk thread picks both up every
+FLUSH_INTERVAL_MS and inserts all pending lines with one Text.insert, so a
+run with thousands of members costs a few redraws a second instead of one
+per line.
+"""
+import time
+import queue
+import threading
+import tkinter as tk
+from tkinter import ttk
+
+from dd2 import instrument
+from dd2.progress import Cancelled
+
+FLUSH_INTERVAL_MS = 100
+MAX_LOG_LINES = 5000
+
+
+def _format_eta(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+class ProgressPanel(ttk.Frame):
+    """Progress bar, throughput / ETA readout and a Cancel button."""
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.bar = ttk.Progressbar(self, mode="determinate", maximum=1000)
+        self.bar.pack(side="left", fill="x", expand=True, padx=(0, 5))
+        self.cancel_button = ttk.Button(self, text="Cancel", state="disabled")
+        self.cancel_button.pack(side="right")
+        self.status_var = tk.StringVar()
+        ttk.Label(self, textvariable=self.status_var, width=38, anchor="e").pack(side="right", padx=5)
+
+    def show(self, done_bytes, total_bytes, elapsed):
+        self.bar["value"] = 1000 * done_bytes / total_bytes if total_bytes else 0
+        rate = done_bytes / elapsed if elapsed > 0 else 0.0
+        status = f"{done_bytes / (1024 * 1024):.1f} / {total_bytes / (1024 * 1024):.1f} MB, {rate / (1024 * 1024):.1f} MB/s"
+        if rate > 0 and done_bytes < total_bytes:
+            status += f", ETA {_format_eta((total_bytes - done_bytes) / rate)}"
+        self.status_var.set(status)
+
+
+class BackgroundJob:
+    """
+    Calls `work(job)` on a worker thread. `work` passes job.log, job.progress
+    and job.cancelled to the library call and returns its result; job.post()
+    runs a function on the Tk thread (e.g. a warning box). When the work is
+    over, exactly one of on_success(result), on_error(exception) or
+    on_cancel() is called on the Tk thread.
+    """
+
+    def __init__(self, root, log_text, panel, work, on_success, on_error, on_cancel=None, busy_widgets=()):
+        self.root = root
+        self.log_text = log_text
+        self.panel = panel
+        self.work = work
+        self.on_success = on_success
+        self.on_error = on_error
+        self.on_cancel = on_cancel
+        self.busy_widgets = busy_widgets
+
+        self._messages = queue.Queue()
+        self._cancel_event = threading.Event()
+        self._progress = None
+        self._outcome = None
+        self._start_time = None
+
+    def start(self):
+        for widget in self.busy_widgets:
+            widget.config(state="disabled")
+        self.panel.cancel_button.config(state="normal", command=self._cancel_event.set)
+        self.panel.show(0, 0, 0)
+        self._start_time = time.perf_counter()
+        threading.Thread(target=self._run, daemon=True).start()
+        self.root.after(FLUSH_INTERVAL_MS, self._flush)
+
+    # --- worker thread side ---
+
+    def log(self, message):
+        self._messages.put((None, message))
+
+    def progress(self, done_bytes, total_bytes):
+        self._progress = (done_bytes, total_bytes)
+
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def post(self, func, *args):
+        self._messages.put((func, args))
+
+    def _run(self):
+        try:
+            self._outcome = ("success", self.work(self))
+        except Cancelled:
+            self._outcome = ("cancel", None)
+        except Exception as e:
+            self._outcome = ("error", e)
+
+    # --- Tk thread side ---
+
+    def _flush(self):
+        # Read the outcome first so every line logged before it is drained below
+        outcome = self._outcome
+        lines = []
+        while True:
+            try:
+                func, payload = self._messages.get_nowait()
+            except queue.Empty:
+                break
+            if func is None:
+                lines.append(payload)
+                continue
+            self._write_lines(lines)
+            lines = []
+            func(*payload)
+        self._write_lines(lines)
+
+        if self._progress is not None:
+            self.panel.show(*self._progress, time.perf_counter() - self._start_time)
+
+        if outcome is None:
+            self.root.after(FLUSH_INTERVAL_MS, self._flush)
+            return
+
+        self.panel.cancel_button.config(state="disabled")
+        for widget in self.busy_widgets:
+            widget.config(state="normal")
+        kind, value = outcome
+        if kind == "success":
+            self.on_success(value)
+        elif kind == "error":
+            self.on_error(value)
+        else:
+            self.panel.status_var.set("Cancelled.")
+            if self.on_cancel:
+                self.on_cancel()
+
+    def _write_lines(self, lines):
+        if not lines:
+            return
+        instrument.count("log_lines", len(lines))
+        with instrument.phase("tk.log"):
+            self.log_text.config(state="normal")
+            self.log_text.insert(tk.END, "\n".join(lines) + "\n")
+            # Keep the widget bounded; the oldest lines go first
+            line_count = int(self.log_text.index("end-1c").split(".")[0])
+            if line_count > MAX_LOG_LINES:
+                self.log_text.delete("1.0", f"{line_count - MAX_LOG_LINES}.0")
+            self.log_text.see(tk.END)
+            self.log_text.config(state="disabled")
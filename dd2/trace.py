@@ -0,0 +1,82 @@
+"""
+Orders the members of a DIRINFO archive by how the game reads them.
+
+An access trace is a text file with one member name per read, in the order
+the game issued them (e.g. taken from an emulator's CD log):
+
+    # lines starting with # are ignored
+    LEV0\\TRACK.DAT
+    LEV0/TEXTURES.DAT
+    lev0\\track.dat
+
+Names may use / or \\ and any case. The packer then gives the members
+consecutive sectors in the order they are first read, so that a load which
+replays the trace mostly streams forward instead of seeking back and forth.
+Only the sector numbers move; the header blocks keep their walk order.
+
+The seek cost of a layout is estimated by replaying the trace on it: the
+drive head starts right after the header, every read moves it to the
+member's first sector and then past its last one, and the distance it had
+to jump before each read is summed up in sectors.
+"""
+import math
+
+_COMMENT = '#'
+
+
+def normalize(name):
+    return name.strip().replace('/', '\\').upper()
+
+
+def load_trace(path):
+    """Returns the member names of the access trace at `path`, in order."""
+    names = []
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith(_COMMENT):
+                names.append(normalize(line))
+    return names
+
+
+def resolve(names, archive_names, stored_length=None):
+    """
+    Maps the trace `names` to indices into `archive_names`. A name also
+    matches the shortened form stored in the header when `stored_length(i)`
+    gives that length for index i. Returns (indices, names not found).
+    """
+    lookup = {}
+    for i, name in enumerate(archive_names):
+        if stored_length is not None:
+            lookup.setdefault(name[:stored_length(i)], i)
+        lookup[name] = i
+    indices = []
+    unknown = []
+    for name in names:
+        i = lookup.get(normalize(name))
+        if i is None:
+            unknown.append(name)
+        else:
+            indices.append(i)
+    return indices, unknown
+
+
+def first_read_order(file_count, trace_indices):
+    """Indices of all `file_count` files: those in the trace by first read, then the rest in their own order."""
+    order = list(dict.fromkeys(trace_indices))
+    seen = set(order)
+    order.extend(i for i in range(file_count) if i not in seen)
+    return order
+
+
+def seek_cost(trace_indices, sectors, sizes, sector_size, start_sector):
+    """Replays the trace on a layout. Returns (sectors the head jumped in total, number of jumps)."""
+    head = start_sector
+    distance = 0
+    seeks = 0
+    for i in trace_indices:
+        if sectors[i] != head:
+            distance += abs(sectors[i] - head)
+            seeks += 1
+        head = sectors[i] + math.ceil(sizes[i] / sector_size)
+    return distance, seeks
@@ -0,0 +1,96 @@
+"""
+Reads what the SBK packer needs from a WAVE file - sample rate, frame count
+and the RIFF size field - from the chunk headers alone. Usually the first
+PROBE_SIZE bytes hold all of them; otherwise the probe seeks from chunk
+header to chunk header and never reads sample data.
+"""
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+PROBE_SIZE = 512
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+_FORMAT_PCM = 0x0001
+_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class WavInfo:
+    __slots__ = ('file_size', 'riff_size', 'sample_rate', 'frame_count')
+
+    def __init__(self, file_size, riff_size, sample_rate, frame_count):
+        self.file_size = file_size
+        self.riff_size = riff_size
+        self.sample_rate = sample_rate
+        self.frame_count = frame_count
+
+    @property
+    def riff_size_ok(self):
+        """True when the RIFF size field covers exactly the rest of the file."""
+        return self.riff_size + 8 == self.file_size
+
+    @property
+    def duration_flag(self):
+        duration_seconds = 0
+        if self.sample_rate > 0:
+            duration_seconds = self.frame_count / float(self.sample_rate)
+        return 1 if duration_seconds >= 1.0 else 0
+
+
+def probe(path):
+    """Returns the WavInfo of the WAVE file at `path`; raises ValueError if it is not a PCM WAVE file."""
+    with open(path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        head = f.read(PROBE_SIZE)
+        if len(head) < 12 or head[0:4] != b'RIFF' or head[8:12] != b'WAVE':
+            raise ValueError("file does not start with a RIFF id")
+        riff_size = struct.unpack_from('<I', head, 4)[0]
+
+        fmt = None
+        position = 12
+        while True:
+            if position + 8 <= len(head):
+                chunk_header = head[position:position + 8]
+            else:
+                f.seek(position)
+                chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                raise ValueError("fmt chunk and/or data chunk missing")
+            chunk_id, chunk_size = struct.unpack('<4sI', chunk_header)
+            body = position + 8
+
+            if chunk_id == b'fmt ':
+                if body + 16 <= len(head):
+                    fmt = head[body:body + 16]
+                else:
+                    f.seek(body)
+                    fmt = f.read(16)
+                if chunk_size < 16 or len(fmt) < 16:
+                    raise ValueError("fmt chunk is too short")
+            elif chunk_id == b'data':
+                if fmt is None:
+                    raise ValueError("data chunk before fmt chunk")
+                break
+            # Chunks are padded to an even size
+            position = body + chunk_size + (chunk_size & 1)
+
+    format_tag, channels, sample_rate, byte_rate, block_align, bits_per_sample = struct.unpack('<HHIIHH', fmt)
+    if format_tag not in (_FORMAT_PCM, _FORMAT_EXTENSIBLE):
+        raise ValueError(f"unknown format: {format_tag}")
+    frame_size = channels * ((bits_per_sample + 7) // 8)
+    if frame_size <= 0:
+        raise ValueError("bad channel count or sample width")
+    return WavInfo(file_size, riff_size, sample_rate, chunk_size // frame_size)
+
+
+def _probe_or_error(path):
+    try:
+        return probe(path), None
+    except (OSError, ValueError, struct.error) as e:
+        return None, e
+
+
+def probe_all(paths, workers=DEFAULT_WORKERS):
+    """Probes `paths` on a thread pool. Returns (WavInfo or None, error or None) pairs in the same order."""
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return list(pool.map(_probe_or_error, paths))